@@ -18,6 +18,10 @@ import os
 import re
 import csv
 import time
+import queue
+import gc
+import atexit
+import threading
 import shutil
 import subprocess
 import tempfile
@@ -25,8 +29,13 @@ import json
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Tuple, Optional, List, Dict, Any
+from typing import Tuple, Optional, List, Dict, Any, Iterator
 from dataclasses import dataclass
+from contextlib import nullcontext
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz  # PyMuPDF
 
 import sys
 
@@ -45,15 +54,16 @@ except Exception:
 
 # ============ 配置文件加载 ============
 
+@lru_cache(maxsize=1)
 def load_configuration() -> Dict[str, Any]:
-    """加载系统配置文件"""
+    """加载系统配置文件（结果缓存，同一进程内只读取一次）"""
     config_path = Path(__file__).parent.parent / "configs" / "config.json"
     if not config_path.exists():
         raise FileNotFoundError(f"配置文件不存在：{config_path}")
 
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        # 一次性按字节读入，由 json 自行识别 UTF-8 编码（可兼容带 BOM 的文件）
+        return json.loads(config_path.read_bytes())
     except Exception as e:
         raise RuntimeError(f"读取配置文件失败：{e}")
 
@@ -120,6 +130,8 @@ VERTICAL_EXPANSION = CONFIG["vertical_expansion"]
 MAX_SIZE_BYTES = CONFIG["max_size_bytes"]
 MAX_PAGES = CONFIG["max_pages"]
 MAX_TIME = CONFIG["max_time"]
+# 并行处理的PDF数量（不超过CPU核数），为1时按顺序处理
+MAX_WORKERS = max(1, min(CONFIG.get("max_workers", 1), os.cpu_count() or 1))
 
 # ========== VLM配置 - 优先从配置文件读取，如果为空则从环境变量读取 ==========
 VLM_API_KEY = get_config_value(CONFIG, "vlm_api_key", "SILICONFLOW_API_KEY")
@@ -135,10 +147,19 @@ VLM_PER_PAGE_TIMEOUT = CONFIG["vlm_per_page_timeout"]
 LOG_PATH = (LOG_DIR or PDF_ROOT) / "batch_translate_log.csv"
 # ======== 文件名/规则 ========
 CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+# 规范文件名 Author-YYYY-Title：作者段不含数字且至少含一个字母，年份为1900-2099，标题段至少含一个字母
+# 仅用于纯ASCII文件名（re.ASCII 下 \d、[^\W\d_] 与 str.isdigit/isalpha 完全一致）；
+# 非ASCII文件名中的全角数字、罗马数字等与 str 方法判定不同，按字符逐段检查
+NORMALIZED_NAME_PATTERN = re.compile(r"[^-\d]*?[^\W\d_][^-\d]*-(?:19|20)\d{2}-.*?[^\W\d_]", re.DOTALL | re.ASCII)
+# pdf2zh 生成的中间文件后缀（小写），str.endswith 接受元组，一次调用完成匹配
+GENERATED_OUTPUT_SUFFIXES = (".mono.pdf", ".dual.pdf")
 
 
 def contains_chinese_characters(text: str) -> bool:
     """检查文本是否包含中文字符"""
+    # 纯ASCII字符串（绝大多数文件名）不可能含中文，isascii() 为 O(1) 判断
+    if text.isascii():
+        return False
     return bool(CJK_PATTERN.search(text))
 
 
@@ -147,27 +168,27 @@ def load_exclusion_keywords() -> List[str]:
     return CONFIG.get("skip_keywords", [])
 
 
+@lru_cache(maxsize=8)
+def _compile_exclusion_pattern(keywords: Tuple[str, ...]) -> "re.Pattern[str]":
+    """将排除关键词编译为单个忽略大小写的正则，一次扫描即可完成匹配"""
+    return re.compile("|".join(re.escape(k) for k in keywords), re.IGNORECASE)
+
+
 def contains_exclusion_keywords(filename: str, keywords: List[str]) -> bool:
     """检查文件名是否包含排除关键词"""
     if not keywords:
         return False
-
-    filename_lower = filename.lower()
-    for keyword in keywords:
-        if keyword in filename_lower:
-            return True
-    return False
+    return _compile_exclusion_pattern(tuple(keywords)).search(filename) is not None
 
 
-def check_translation_metadata_status(pdf_path: Path) -> Tuple[bool, str]:
+def check_translation_metadata_status(pdf_path: Path, doc: Optional["fitz.Document"] = None) -> Tuple[bool, str]:
     """
     检查PDF内嵌元数据中的翻译状态
+    doc: 可选，已打开的文档对象；传入时直接复用，不再重新打开
     返回: (是否已翻译, 检查结果说明)
     """
     try:
-        import fitz
-
-        with fitz.open(pdf_path) as doc:
+        with (nullcontext(doc) if doc is not None else fitz.open(pdf_path)) as doc:
             # 获取嵌入文件列表
             embfiles = doc.embfile_names()
 
@@ -200,9 +221,10 @@ def check_translation_metadata_status(pdf_path: Path) -> Tuple[bool, str]:
         return False, f"metadata_check_failed:{e}"
 
 
-def detect_chinese_content_via_vlm(pdf_path: Path) -> Tuple[bool, str]:
+def detect_chinese_content_via_vlm(pdf_path: Path, doc: Optional["fitz.Document"] = None) -> Tuple[bool, str]:
     """
     使用视觉语言模型检测PDF是否为中文内容
+    doc: 可选，已打开的文档对象；传入时直接复用，不再重新打开
     返回: (是否为中文PDF, 检测结果说明)
     """
     if not _HAS_VLM_DETECT:
@@ -213,7 +235,7 @@ def detect_chinese_content_via_vlm(pdf_path: Path) -> Tuple[bool, str]:
 
     try:
         result = detect_pdf_language_via_vlm(
-            pdf_path=str(pdf_path),
+            pdf_path=doc if doc is not None else str(pdf_path),
             k_pages=VLM_K_PAGES,
             dpi=VLM_DPI,
             seed=42,
@@ -233,13 +255,25 @@ def detect_chinese_content_via_vlm(pdf_path: Path) -> Tuple[bool, str]:
         return False, f"vlm_detection_failed: {e}"
 
 
-def should_exclude_from_processing(pdf_path: Path, exclusion_keywords: List[str], failure_counts: dict) -> Tuple[bool, str]:
+def _open_pdf_or_none(pdf_path: Path) -> Optional["fitz.Document"]:
+    """打开PDF文档，失败时返回 None（由后续检查各自回退处理）"""
+    try:
+        return fitz.open(pdf_path)
+    except Exception:
+        return None
+
+
+def should_exclude_from_processing(pdf_path: Path, exclusion_keywords: List[str], failure_counts: dict,
+                                   size: Optional[int] = None, known_translated: bool = False) -> Tuple[bool, str]:
     """
     检查是否应该排除此PDF文件不进行处理
+    size: 可选，扫描目录时已获得的文件大小；未提供时再调用 stat 获取
+    known_translated: 元数据清单命中且显示已翻译时为 True，可跳过打开PDF读取元数据
     返回: (是否排除, 排除原因)
     """
     stem = pdf_path.stem
-    size = pdf_path.stat().st_size
+    if size is None:
+        size = pdf_path.stat().st_size
 
     # 检查累计失败次数
     if failure_counts.get(str(pdf_path), 0) >= 3:
@@ -251,67 +285,82 @@ def should_exclude_from_processing(pdf_path: Path, exclusion_keywords: List[str]
     # 先过滤：备份/生成文件自身不参与翻译
     if lower_name.endswith("_original.pdf"):
         return True, "is_backup_original"
-    if lower_name.endswith(".mono.pdf") or lower_name.endswith(".dual.pdf"):
+    if lower_name.endswith(GENERATED_OUTPUT_SUFFIXES):
         return True, "is_generated_output"
 
-    # 优先级最高：检查元数据中的翻译状态
-    if SKIP_TRANSLATED_BY_METADATA:
-        is_translated, metadata_info = check_translation_metadata_status(pdf_path)
-        if is_translated:
-            return True, f"already_translated_by_metadata:{metadata_info}"
-
-    # 检查排除关键词
-    if SKIP_CONTAINS_SKIP_KEYWORDS and contains_exclusion_keywords(pdf_path.name, exclusion_keywords):
-        return True, "contains_exclusion_keywords"
-
-    # 检查是否已存在备份
-    if backup_path.exists():
-        return True, "backup_exists"
-
-    # 检查文件名是否包含中文
-    if SKIP_FILENAME_CONTAINS_CHINESE and contains_chinese_characters(pdf_path.name):
-        return True, "filename_contains_chinese"
+    # 文档只打开一次，供元数据/页数/VLM检测共用；且延迟到确实需要时才打开，
+    # 仅凭文件名即可排除的文件无需解析PDF
+    doc = None
 
-    # 检查文件名格式
-    if SKIP_FILENAME_FORMAT_CHECK and not is_normalized_name(stem):
-        return True, "bad_name_pattern"
-
-    # 检查页数
-    pages = get_page_count(pdf_path)
-    if pages is None:
-        return True, "page_count_failed"
-    if SKIP_MAX_PAGES and pages > MAX_PAGES:
-        return True, f"pages_gt_{MAX_PAGES}"
-
-    # 检查文件大小
-    if SKIP_MAX_FILE_SIZE and size >= MAX_SIZE_BYTES:
-        return True, f"size_gt_{MAX_SIZE_BYTES}"
-
-    # 检查是否为中文PDF（使用大模型检测）- 放在最后，仅在其他规则都不排除时才运行
-    if SKIP_CHINESE_PDF_VLM:
-        is_chinese, detection_result = detect_chinese_content_via_vlm(pdf_path)
-        if is_chinese:
-            return True, f"chinese_pdf_vlm:{detection_result}"
-
-    return False, ""
+    try:
+        # 优先级最高：检查元数据中的翻译状态（清单命中时无需打开PDF）
+        if SKIP_TRANSLATED_BY_METADATA:
+            if known_translated:
+                return True, "already_translated_by_metadata:manifest_cached"
+            doc = _open_pdf_or_none(pdf_path)
+            is_translated, metadata_info = check_translation_metadata_status(pdf_path, doc)
+            if is_translated:
+                return True, f"already_translated_by_metadata:{metadata_info}"
+
+        # 检查排除关键词
+        if SKIP_CONTAINS_SKIP_KEYWORDS and contains_exclusion_keywords(pdf_path.name, exclusion_keywords):
+            return True, "contains_exclusion_keywords"
+
+        # 检查是否已存在备份
+        if backup_path.exists():
+            return True, "backup_exists"
+
+        # 检查文件名是否包含中文
+        if SKIP_FILENAME_CONTAINS_CHINESE and contains_chinese_characters(pdf_path.name):
+            return True, "filename_contains_chinese"
+
+        # 检查文件名格式
+        if SKIP_FILENAME_FORMAT_CHECK and not is_normalized_name(stem):
+            return True, "bad_name_pattern"
+
+        # 检查页数
+        if doc is None:
+            doc = _open_pdf_or_none(pdf_path)
+        pages = get_page_count(pdf_path, doc)
+        if pages is None:
+            return True, "page_count_failed"
+        if SKIP_MAX_PAGES and pages > MAX_PAGES:
+            return True, f"pages_gt_{MAX_PAGES}"
+
+        # 检查文件大小
+        if SKIP_MAX_FILE_SIZE and size >= MAX_SIZE_BYTES:
+            return True, f"size_gt_{MAX_SIZE_BYTES}"
+
+        # 检查是否为中文PDF（使用大模型检测）- 放在最后，仅在其他规则都不排除时才运行
+        if SKIP_CHINESE_PDF_VLM:
+            is_chinese, detection_result = detect_chinese_content_via_vlm(pdf_path, doc)
+            if is_chinese:
+                return True, f"chinese_pdf_vlm:{detection_result}"
+
+        return False, ""
+    finally:
+        if doc is not None:
+            doc.close()
 
 
 def is_normalized_name(stem: str) -> bool:
+    # 纯ASCII文件名（绝大多数）不可能含中文，一次正则匹配即可完成判定
+    if stem.isascii():
+        return NORMALIZED_NAME_PATTERN.match(stem) is not None
     if contains_chinese_characters(stem):
         return False
-    parts = stem.split("-")
-    if len(parts) < 3:
+    author, sep, rest = stem.partition("-")
+    year, sep, title_rest = rest.partition("-")
+    if not sep:
         return False
-    author, year, title_rest = parts[0], parts[1], "-".join(parts[2:])
-    if not (year.isdigit() and 1900 <= int(year) <= 2099 and len(year) == 4):
+    # isdecimal 的字符串 int() 一定可以解析（含全角数字）；上标数字等 isdigit 为真但无法解析，视为不合格
+    if not (len(year) == 4 and year.isdecimal() and 1900 <= int(year) <= 2099):
         return False
     if any(ch.isdigit() for ch in author):
         return False
     if not any(ch.isalpha() for ch in author):
         return False
-    if not any(ch.isalpha() for ch in title_rest):
-        return False
-    return True
+    return any(ch.isalpha() for ch in title_rest)
 
 
 def ensure_csv_header(path: Path):
@@ -323,23 +372,82 @@ def ensure_csv_header(path: Path):
             w.writerow(header)
 
 
-def log_row(status: str, pdf: Path, reason: str = "", pages=None, size=None, duration=None):
-    with open(LOG_PATH, "a", newline="", encoding="utf-8-sig") as f:
+def format_log_row(status: str, pdf: Path, reason: str = "", pages=None, size=None, duration=None) -> List[str]:
+    return [
+        time.strftime("%Y/%m/%d %H:%M"),
+        status,
+        str(pdf),
+        reason,
+        pages if pages is not None else "",
+        size if size is not None else "",
+        f"{duration:.2f}" if duration is not None else "",
+    ]
+
+
+# ======== CSV 日志单写入线程 ========
+# 日志文件只打开一次，由后台线程批量写入；队列清空时刷新，保证日志及时落盘
+_LOG_QUEUE: "queue.Queue[Optional[List[List[str]]]]" = queue.Queue()
+_LOG_WRITER: Optional[threading.Thread] = None
+
+
+def _log_writer_loop(path: Path):
+    with open(path, "a", newline="", encoding="utf-8-sig", buffering=1 << 16) as f:
         w = csv.writer(f)
-        w.writerow([
-            time.strftime("%Y/%m/%d %H:%M"),
-            status,
-            str(pdf),
-            reason,
-            pages if pages is not None else "",
-            size if size is not None else "",
-            f"{duration:.2f}" if duration is not None else "",
-        ])
-
-
-def get_page_count(pdf_path: Path) -> Optional[int]:
+        while True:
+            rows = _LOG_QUEUE.get()
+            if rows is None:
+                break
+            w.writerows(rows)
+            if _LOG_QUEUE.empty():
+                f.flush()
+
+
+def write_log_rows(rows: List[List[str]]):
+    global _LOG_WRITER
+    if not rows:
+        return
+    if _LOG_WRITER is None:
+        _LOG_WRITER = threading.Thread(target=_log_writer_loop, args=(LOG_PATH,), daemon=True)
+        _LOG_WRITER.start()
+        atexit.register(close_log_writer)
+    _LOG_QUEUE.put(rows)
+
+
+def close_log_writer():
+    """写完队列中剩余的日志并关闭日志文件"""
+    global _LOG_WRITER
+    if _LOG_WRITER is not None:
+        _LOG_QUEUE.put(None)
+        _LOG_WRITER.join()
+        _LOG_WRITER = None
+
+
+# 最近一个文件的页数：{(路径, mtime_ns, 大小): 页数}
+# 排除检查、跳过日志与后续处理都会查询页数，同一文件只解析一次；文件变化后键随之失效
+_PAGE_COUNT_CACHE: Dict[Tuple[str, int, int], int] = {}
+
+
+def get_page_count(pdf_path: Path, doc: Optional["fitz.Document"] = None) -> Optional[int]:
+    try:
+        st = os.stat(pdf_path)
+        key = (str(pdf_path), st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+    if key is not None and key in _PAGE_COUNT_CACHE:
+        return _PAGE_COUNT_CACHE[key]
+
+    pages = _read_page_count(pdf_path, doc)
+    if key is not None and pages is not None:
+        # 只保留最近一个文件，避免批处理过程中缓存无限增长
+        _PAGE_COUNT_CACHE.clear()
+        _PAGE_COUNT_CACHE[key] = pages
+    return pages
+
+
+def _read_page_count(pdf_path: Path, doc: Optional["fitz.Document"] = None) -> Optional[int]:
+    if doc is not None:
+        return doc.page_count
     try:
-        import fitz  # PyMuPDF
         with fitz.open(pdf_path) as doc:
             return doc.page_count
     except Exception:
@@ -359,6 +467,7 @@ FAIL_LOG_PATH = PDF2ZH_EXE.parent / "fail_log.txt"
 
 
 def read_failure_counts(path: Path) -> dict[str, int]:
+    # 失败日志为追加写入，同一路径可能出现多行，以最后一行的计数为准
     counts = {}
     if not path.exists():
         return counts
@@ -377,14 +486,38 @@ def read_failure_counts(path: Path) -> dict[str, int]:
 def increment_and_write_failure(pdf_path: Path, counts: dict[str, int], log_file: Path):
     key = str(pdf_path)
     counts[key] = counts.get(key, 0) + 1
+    # 只追加一行最新计数，无需每次重写整个文件（同一文件失败 3 次后即被跳过，文件增长有限）
     try:
-        with open(log_file, "w", encoding="utf-8") as f:
-            for p, c in sorted(counts.items()):
-                f.write(f"{p},{c}\n")
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(f"{key},{counts[key]}\n")
     except Exception as e:
         print(f"  警告：无法写入失败日志 {log_file}: {e}", flush=True)
 
 
+# ======== 元数据清单：缓存“已翻译”判定 ========
+# {路径: [mtime_ns, 文件大小]}：修改时间与大小均未变化时，直接沿用上次的判定，无需打开PDF读取元数据
+MANIFEST_PATH = PDF_ROOT / ".pdf2zh_manifest.json"
+
+
+def read_translation_manifest(path: Path) -> Dict[str, List[int]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except Exception:
+        return {}
+
+
+def write_translation_manifest(path: Path, manifest: Dict[str, List[int]]):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"  警告：无法写入元数据清单 {path}: {e}", flush=True)
+
+
 # =================================
 
 # ======== 服务配置 ========
@@ -423,7 +556,7 @@ def _build_cmd_base(input_pdf: Path, output_dir: Path, watermark_mode: str, enab
         "--lang-in", LANG_IN,
         "--lang-out", LANG_OUT,
         "--watermark-output-mode", watermark_mode,  # NoWaterMark / no_watermark
-        "--qps", str(QPS_LIMIT),
+        "--qps", str(max(1, QPS_LIMIT // MAX_WORKERS)),  # 多进程并行时均分总QPS
         "--no-auto-extract-glossary",
         "--output", str(output_dir),
         str(input_pdf)
@@ -435,6 +568,27 @@ def _build_cmd_base(input_pdf: Path, output_dir: Path, watermark_mode: str, enab
     return cmd
 
 
+WATERMARK_MODES = ["NoWaterMark", "no_watermark"]
+WATERMARK_ARG_ERROR_PATTERN = re.compile(rb"watermark.*invalid|invalid.*watermark|unknown.*watermark",
+                                         re.IGNORECASE | re.DOTALL)
+
+
+@lru_cache(maxsize=1)
+def _supported_watermark_modes() -> List[str]:
+    """
+    通过 pdf2zh --help 检测其接受的水印参数写法，返回按优先级排列的候选列表
+    （检测失败时返回全部写法，由调用方依次尝试）
+    """
+    try:
+        proc = subprocess.run([str(PDF2ZH_EXE), "--help"], stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT, timeout=60)
+        help_text = proc.stdout or b""
+    except Exception:
+        return WATERMARK_MODES
+    supported = [wm for wm in WATERMARK_MODES if wm.encode() in help_text]
+    return supported or WATERMARK_MODES
+
+
 def execute_pdf2zh_translation(input_pdf: Path, output_dir: Path, enable_ocr: bool = False) -> Tuple[bool, str]:
     """
     执行PDF翻译任务，静默模式运行不显示日志输出
@@ -444,29 +598,29 @@ def execute_pdf2zh_translation(input_pdf: Path, output_dir: Path, enable_ocr: bo
     pdf_to_process = input_pdf
     temp_input = None
     if input_pdf.name.encode("ascii", "ignore").decode("ascii") != input_pdf.name:
-        temp_input = output_dir / f"__temp_input_{int(time.time())}.pdf"
+        temp_input = output_dir / f"__temp_input_{int(time.time())}_{uuid.uuid4().hex[:8]}.pdf"
         try:
-            shutil.copy2(input_pdf, temp_input)
+            shutil.copyfile(input_pdf, temp_input)
             pdf_to_process = temp_input
         except Exception as e:
             return False, f"TempCopyFail: {e}"
 
-    attempts = []
-    for wm in ["NoWaterMark", "no_watermark"]:
-        attempts.append(_build_cmd_base(pdf_to_process, output_dir, wm, enable_ocr=enable_ocr))
-
     ok = False
     last_reason = ""
-    for cmd in attempts:
+    for wm in _supported_watermark_modes():
+        cmd = _build_cmd_base(pdf_to_process, output_dir, wm, enable_ocr=enable_ocr)
         try:
             proc = subprocess.run(
                 cmd, cwd=str(output_dir),
-                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=MAX_TIME
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=MAX_TIME
             )
             if proc.returncode == 0:
                 ok, last_reason = True, "OK"
                 break
             last_reason = f"exit={proc.returncode}"
+            # 仅当失败原因是水印参数写法不被接受时，才换用另一种写法重试
+            if not WATERMARK_ARG_ERROR_PATTERN.search(proc.stderr or b""):
+                break
         except subprocess.TimeoutExpired as e:
             last_reason = f"TIMEOUT: {e}";
             break
@@ -496,14 +650,25 @@ def execute_pdf2zh_translation(input_pdf: Path, output_dir: Path, enable_ocr: bo
 
 # ============== CSV 清理：删除本次新生成的 csv ==============
 def cleanup_new_csvs(folder: Path, t_start: float):
+    # 日志文件可能与PDF位于同一目录（未配置 log_dir 时位于 PDF_ROOT），且在运行期间一直由日志线程写入，不能清理
+    log_path = os.path.normcase(os.path.realpath(LOG_PATH))
     removed = 0
-    for p in folder.glob("*.csv"):
-        try:
-            if p.stat().st_mtime >= t_start - 1:
-                p.unlink(missing_ok=True)
-                removed += 1
-        except Exception:
-            pass
+    try:
+        it = os.scandir(folder)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if not entry.name.lower().endswith(".csv"):
+                continue
+            try:
+                if os.path.normcase(os.path.realpath(entry.path)) == log_path:
+                    continue
+                if entry.stat().st_mtime >= t_start - 1:
+                    os.unlink(entry.path)
+                    removed += 1
+            except Exception:
+                pass
     if removed:
         print(f"  已清理 exe 生成的 CSV：{removed} 个", flush=True)
 
@@ -511,7 +676,6 @@ def cleanup_new_csvs(folder: Path, t_start: float):
 # =========================================================
 
 # ================= 横向拼接并覆盖原名 =================
-import fitz  # PyMuPDF
 
 
 def _set_all_page_boxes(page: fitz.Page, rect: fitz.Rect):
@@ -523,28 +687,13 @@ def _set_all_page_boxes(page: fitz.Page, rect: fitz.Rect):
                 pass
 
 
-def extract_page_dimensions(pdf_path: Path) -> List[Dict[str, float]]:
-    """提取PDF每页的尺寸信息（单位：pt）"""
-    try:
-        import fitz
-        with fitz.open(pdf_path) as doc:
-            sizes = []
-            for page in doc:
-                rect = page.rect
-                sizes.append({"w": round(rect.width, 2), "h": round(rect.height, 2)})
-            return sizes
-    except Exception as e:
-        print(f"  警告：获取PDF页面尺寸失败：{e}", flush=True)
-        return []
-
-
 def create_translation_metadata(status: str, source_sizes: List[Dict[str, float]],
                                 result_sizes: List[Dict[str, float]] = None,
                                 gap_pt: float = 0.0) -> Dict[str, Any]:
     """创建翻译元数据JSON"""
     metadata = {
         "pdf2zh.status": status,
-        "pdf2zh.run_time_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        "pdf2zh.run_time_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
     }
 
     if status == "translated":
@@ -565,15 +714,14 @@ def create_translation_metadata(status: str, source_sizes: List[Dict[str, float]
 def embed_minimal_metadata(pdf_path: Path):
     """为原始PDF嵌入最小元数据（仅包含运行时间和状态）"""
     try:
-        import fitz
-
         # 创建最小元数据（仅状态和时间）
         metadata = create_translation_metadata("untranslated", [])  # source_sizes为空数组
 
+        tmp_path = None
         with fitz.open(pdf_path) as doc:
             # 添加元数据JSON附件
             meta_name = "pdf2zh.meta.json"
-            meta_content = json.dumps(metadata, ensure_ascii=False, indent=2).encode('utf-8')
+            meta_content = json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
             doc.embfile_add(meta_name, meta_content, desc="PDF2ZH metadata")
 
             # 设置AF关系（Associated Files）
@@ -584,8 +732,17 @@ def embed_minimal_metadata(pdf_path: Path):
                 # AF关系设置失败不影响主要功能，仅记录警告
                 pass
 
-            # 保存修改
-            doc.saveIncr()
+            # 保存修改：可增量保存时只追加改动对象（新增对象压缩存储）；
+            # 经过修复的文件无法增量写入，改为完整保存到临时文件后替换
+            if doc.can_save_incrementally():
+                doc.save(doc.name, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, deflate=True)
+            else:
+                tmp_path = pdf_path.with_name(f"{pdf_path.stem}_tmp_{uuid.uuid4().hex[:8]}.pdf")
+                doc.save(str(tmp_path), garbage=1, deflate=True)
+
+        if tmp_path is not None and not _atomic_replace_with_retry(tmp_path, pdf_path):
+            _retry_unlink(tmp_path)
+            return False, "replace_failed"
 
         return True, ""
 
@@ -593,57 +750,54 @@ def embed_minimal_metadata(pdf_path: Path):
         return False, str(e)
 
 
-def embed_original_file_attachment(pdf_path: Path, original_pdf: Path, metadata: Dict[str, Any]):
-    """为PDF嵌入原始文件附件和可点击标签"""
+def embed_original_file_attachment(doc: "fitz.Document", original_pdf: Path, metadata: Dict[str, Any]):
+    """为已打开的PDF嵌入原始文件附件和可点击标签（不保存，由调用方随拼接结果一并保存）"""
     try:
-        import fitz
-
-        with fitz.open(pdf_path) as doc:
-            # 1. 添加元数据JSON附件
-            meta_name = "pdf2zh.meta.json"
-            meta_content = json.dumps(metadata, ensure_ascii=False, indent=2).encode('utf-8')
-            doc.embfile_add(meta_name, meta_content, desc="PDF2ZH metadata")
+        # 1. 添加元数据JSON附件
+        meta_name = "pdf2zh.meta.json"
+        meta_content = json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # 输出文档沿用原文件，原文件可能已带有“未翻译”状态的元数据附件，先移除旧的
+        if meta_name in doc.embfile_names():
+            doc.embfile_del(meta_name)
+        doc.embfile_add(meta_name, meta_content, desc="PDF2ZH metadata")
+
+        # 2. 在第1页添加可点击标签
+        if doc.page_count > 0:
+            page = doc[0]
+
+            # 标签位置和尺寸（左上角，留边距）
+            margin = 8  # pt
+            tag_width = 140  # pt
+            tag_height = 26  # pt
+
+            tag_rect = fitz.Rect(margin, margin, margin + tag_width, margin + tag_height)
+
+            # 读取原始PDF内容用于标签
+            original_name = original_pdf.name
+            with open(original_pdf, 'rb') as f:
+                original_content = f.read()
+
+            # 创建文件附件注释（图钉样式）
+            annot = page.add_file_annot(
+                tag_rect.tl,  # 位置点
+                original_content,  # 文件内容
+                original_name,  # 文件名
+                desc=f"点击打开原始PDF：{original_name}",
+                icon="PushPin"  # 图钉图标
+            )
 
-            # 2. 在第1页添加可点击标签
-            if doc.page_count > 0:
-                page = doc[0]
-
-                # 标签位置和尺寸（左上角，留边距）
-                margin = 8  # pt
-                tag_width = 140  # pt
-                tag_height = 26  # pt
-
-                tag_rect = fitz.Rect(margin, margin, margin + tag_width, margin + tag_height)
-
-                # 读取原始PDF内容用于标签
-                original_name = original_pdf.name
-                with open(original_pdf, 'rb') as f:
-                    original_content = f.read()
-
-                # 创建文件附件注释（图钉样式）
-                annot = page.add_file_annot(
-                    tag_rect.tl,  # 位置点
-                    original_content,  # 文件内容
-                    original_name,  # 文件名
-                    desc=f"点击打开原始PDF：{original_name}",
-                    icon="PushPin"  # 图钉图标
-                )
-
-                # 设置注释属性
-                annot.set_info(title="原始PDF", content=f"打开原稿（{original_name}）")
-                annot.update()
-
-            # 3. 设置AF关系（Associated Files）
-            # 只为元数据附件设置关联文件关系
-            af_list = [meta_name]
-            try:
-                doc.set_metadata({"af": af_list})
-            except Exception as af_error:
-                # AF关系设置失败不影响主要功能，仅记录警告
-                pass
+            # 设置注释属性
+            annot.set_info(title="原始PDF", content=f"打开原稿（{original_name}）")
+            annot.update()
 
-            # 保存修改
-            doc.saveIncr()
+        # 3. 设置AF关系（Associated Files）
+        # 只为元数据附件设置关联文件关系
+        af_list = [meta_name]
+        try:
+            doc.set_metadata({"af": af_list})
+        except Exception as af_error:
+            # AF关系设置失败不影响主要功能，仅记录警告
+            pass
 
         return True, ""
 
@@ -651,11 +805,47 @@ def embed_original_file_attachment(pdf_path: Path, original_pdf: Path, metadata:
         return False, str(e)
 
 
+# Windows 上使用 ReplaceFileW / MoveFileExW 替换文件：由系统在持锁状态下完成交换，
+# 目标文件被只读打开时也更容易成功，并保留目标文件的属性与创建时间
+if os.name == "nt":
+    import ctypes
+    from ctypes import wintypes
+
+    _KERNEL32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _KERNEL32.ReplaceFileW.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.LPCWSTR,
+                                       wintypes.DWORD, wintypes.LPVOID, wintypes.LPVOID]
+    _KERNEL32.ReplaceFileW.restype = wintypes.BOOL
+    _KERNEL32.MoveFileExW.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD]
+    _KERNEL32.MoveFileExW.restype = wintypes.BOOL
+else:
+    _KERNEL32 = None
+
+REPLACEFILE_WRITE_THROUGH = 0x1
+REPLACEFILE_IGNORE_MERGE_ERRORS = 0x2
+MOVEFILE_REPLACE_EXISTING = 0x1
+MOVEFILE_WRITE_THROUGH = 0x8
+
+
+def _replace_file(src: Path, dst: Path):
+    """用 src 替换 dst；Windows 上依次尝试 ReplaceFileW、MoveFileExW，失败时抛出 OSError（含 PermissionError）"""
+    if _KERNEL32 is None:
+        os.replace(str(src), str(dst))
+        return
+    # ReplaceFileW 要求目标已存在；目标不存在或替换失败时退回 MoveFileExW
+    if _KERNEL32.ReplaceFileW(str(dst), str(src), None,
+                              REPLACEFILE_WRITE_THROUGH | REPLACEFILE_IGNORE_MERGE_ERRORS, None, None):
+        return
+    if _KERNEL32.MoveFileExW(str(src), str(dst), MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH):
+        return
+    # 共享冲突/拒绝访问会映射为 PermissionError，交由调用方重试
+    raise ctypes.WinError(ctypes.get_last_error())
+
+
 def _atomic_replace_with_retry(src: Path, dst: Path, max_retries=10, initial_delay=0.1):
     """带重试的原子替换，处理Windows文件锁定问题"""
     for attempt in range(max_retries):
         try:
-            os.replace(str(src), str(dst))
+            _replace_file(src, dst)
             return True
         except PermissionError:
             if attempt == max_retries - 1:
@@ -680,27 +870,39 @@ def _retry_unlink(path: Path, max_retries=5, initial_delay=0.05):
 
 
 def merge_pdfs_preserve_annotations(pdf_left: Path, pdf_right: Path, output_path: Path,
-                                        gap: float = 0.0, vertical_expansion: float = 0.0):
-    left_doc = fitz.open(pdf_left)
-    right_doc = fitz.open(pdf_right)
-    out = fitz.open()
-    try:
-        if len(left_doc) != len(right_doc):
-            raise ValueError(f"两个 PDF 页数不同：左 {len(left_doc)} 页，右 {len(right_doc)} 页。")
-
-        # 复制左侧整册（保留批注 / 链接）
-        out.insert_pdf(left_doc)
-
-        total = len(left_doc)
+                                        gap: float = 0.0, vertical_expansion: float = 0.0,
+                                        original_pdf: Optional[Path] = None
+                                    ) -> Tuple[List[Dict[str, float]], List[Dict[str, float]], str]:
+    """
+    横向拼接左右两个PDF并覆盖保存到 output_path
+    original_pdf: 可选，提供时在同一次保存中嵌入翻译元数据与原始PDF附件
+    返回: (原始页面尺寸, 拼接后页面尺寸, 附件错误信息)，尺寸单位 pt，在拼接循环中顺带记录；
+          附件嵌入成功或未请求时错误信息为空字符串
+    """
+    attach_error = ""
+    source_sizes: List[Dict[str, float]] = []
+    result_sizes: List[Dict[str, float]] = []
+    # 直接以左侧 PDF 作为输出文档（保留批注 / 链接），省去整册深拷贝
+    # with 语句保证保存后、替换前两个文档句柄均已关闭（打开右侧失败时左侧也会关闭）
+    with fitz.open(pdf_left) as out, fitz.open(pdf_right) as right_doc:
+        if len(out) != len(right_doc):
+            raise ValueError(f"两个 PDF 页数不同：左 {len(out)} 页，右 {len(right_doc)} 页。")
+
+        total = len(out)
         for i in range(total):
             page = out[i]
-            lw, lh = page.rect.width, page.rect.height
+            # page.rect 每次访问都会新建 Rect 对象，取一次即可
+            rect = page.rect
+            lw, lh = rect.width, rect.height
+            source_sizes.append({"w": round(lw, 2), "h": round(lh, 2)})
             
             # 计算新的页面尺寸（支持垂直拓展）
             new_w = 2 * lw + gap
             new_h = lh + vertical_expansion
             new_rect = fitz.Rect(0, 0, new_w, new_h)
             _set_all_page_boxes(page, new_rect)
+            result_rect = page.rect
+            result_sizes.append({"w": round(result_rect.width, 2), "h": round(result_rect.height, 2)})
 
             # 计算右侧目标位置（考虑垂直拓展时的垂直居中）
             if vertical_expansion > 0:
@@ -713,24 +915,18 @@ def merge_pdfs_preserve_annotations(pdf_left: Path, pdf_right: Path, output_path
             
             page.show_pdf_page(right_target, right_doc, i)
 
+        # 元数据与原始附件直接写入内存中的文档，随拼接结果一次保存，避免再次打开并增量保存
+        if original_pdf is not None:
+            metadata = create_translation_metadata("translated", source_sizes, result_sizes, gap)
+            attach_ok, attach_error = embed_original_file_attachment(out, original_pdf, metadata)
+            if not attach_ok:
+                attach_error = attach_error or "unknown_error"
+
         # 鲁棒的临时文件处理
         temp_uuid = uuid.uuid4().hex[:8]
         tmp_path = output_path.parent / f"{output_path.stem}_tmp_{temp_uuid}.pdf"
-        out.save(str(tmp_path), garbage=4, deflate=True)
-    finally:
-        # 确保所有文档句柄关闭
-        try:
-            out.close()
-        except Exception:
-            pass
-        try:
-            left_doc.close()
-        except Exception:
-            pass
-        try:
-            right_doc.close()
-        except Exception:
-            pass
+        # 仅清理未引用对象（garbage=1），不做去重扫描，也不重写/重新压缩已有的内容流、图片和字体
+        out.save(str(tmp_path), garbage=1, deflate=True, clean=False, deflate_images=False, deflate_fonts=False)
 
     # 原子替换（带重试）
     if not _atomic_replace_with_retry(tmp_path, output_path):
@@ -743,239 +939,330 @@ def merge_pdfs_preserve_annotations(pdf_left: Path, pdf_right: Path, output_path
     if tmp_path.exists():
         _retry_unlink(tmp_path)
 
+    return source_sizes, result_sizes, attach_error
+
 
 # =========================================================
 
+def iter_pdf_entries(root: Path) -> Iterator[os.DirEntry]:
+    """递归遍历目录，逐个产出PDF文件的目录项（DirEntry 缓存了目录读取时的信息，可减少 stat 调用）"""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_pdf_entries(entry.path)
+            elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                yield entry
+
+
 def get_expected_mono_output_path(src_pdf: Path) -> Path:
     # Paper.pdf -> Paper.no_watermark.zh-CN.mono.pdf
     return src_pdf.parent / f"{src_pdf.stem}.no_watermark.{LANG_OUT}.mono.pdf"
 
 
 def find_most_recent_matching_file(glob_pattern: str) -> Optional[Path]:
-    candidates = sorted(Path(glob_pattern).parent.glob(Path(glob_pattern).name),
-                       key=lambda p: p.stat().st_mtime if p.exists() else 0,
-                       reverse=True)
-    return candidates[0] if candidates else None
+    # 单次遍历取修改时间最新者，每个候选只 stat 一次，无需排序
+    pattern = Path(glob_pattern)
+    best, best_mtime = None, -1.0
+    for p in pattern.parent.glob(pattern.name):
+        try:
+            mtime = p.stat().st_mtime
+        except OSError:
+            continue
+        if mtime > best_mtime:
+            best, best_mtime = p, mtime
+    return best
 
 
-def main():
-    if not PDF2ZH_EXE.exists():
-        raise FileNotFoundError(f"找不到可执行文件：{PDF2ZH_EXE}")
+def process_single_pdf(idx: int, total_files: int, pdf_path: Path, size: int, skip_keywords: List[str],
+                       failure_counts: dict, known_translated: bool = False) -> Tuple[str, List[List[str]], bool]:
+    """
+    处理单个PDF：排除检查、翻译、备份、拼接与清理
 
-    failure_counts = read_failure_counts(FAIL_LOG_PATH)
-    skip_keywords = load_exclusion_keywords()  # 加载排除关键词
+    为便于多进程并行，本函数不直接写日志文件、失败计数和元数据清单，
+    而是返回 (结果状态, 日志行列表, 是否经元数据确认已翻译)，由主进程统一写入。
+    结果状态：done / skipped / failed
+    known_translated: 元数据清单已记录该文件（且修改时间、大小未变）为已翻译
+    """
+    log_rows: List[List[str]] = []
 
-    if skip_keywords:
-        print(f"已加载 {len(skip_keywords)} 个排除关键词：{', '.join(skip_keywords)}", flush=True)
+    def log(status: str, pdf: Path, reason: str = "", pages=None, size=None, duration=None):
+        log_rows.append(format_log_row(status, pdf, reason=reason, pages=pages, size=size, duration=duration))
 
-    pdf_files = []
-    for root, _, files in os.walk(PDF_ROOT):
-        for name in files:
-            if name.lower().endswith(".pdf"):
-                pdf_files.append(Path(root) / name)
+    stem = pdf_path.stem
 
-    ensure_csv_header(LOG_PATH)
-    done = skipped = failed = 0
-    total_files = len(pdf_files)
-    print(f"发现 PDF 共 {total_files} 个，开始处理……", flush=True)
+    # 使用新的统一排除检查函数
+    should_exclude, exclude_reason = should_exclude_from_processing(pdf_path, skip_keywords, failure_counts, size,
+                                                                    known_translated)
+    if should_exclude:
+        # 获取页数信息用于日志记录
+        pages = get_page_count(pdf_path) if exclude_reason.startswith("pages_gt_") else None
+        log("skipped", pdf_path, reason=exclude_reason, size=size, pages=pages)
+
+        if not SUPPRESS_SKIPPED_OUTPUT:
+            print(f"\n[{idx}/{total_files}] 处理：{pdf_path.name}", flush=True)
+            if exclude_reason == "too_many_failures":
+                print(f"  排除：该文件已累计失败 {failure_counts.get(str(pdf_path), 0)} 次，不再尝试。", flush=True)
+            elif exclude_reason == "is_backup_original":
+                print("  排除：备份文件 *_original.pdf", flush=True)
+            elif exclude_reason == "is_generated_output":
+                print("  排除：已生成的 mono/dual 文件", flush=True)
+            elif exclude_reason.startswith("already_translated_by_metadata:"):
+                print("  排除：元数据显示已翻译", flush=True)
+            elif exclude_reason == "contains_exclusion_keywords":
+                print("  排除：文件名包含排除关键词", flush=True)
+            elif exclude_reason == "backup_exists":
+                print("  排除：已存在 *_original 备份", flush=True)
+            elif exclude_reason == "filename_contains_chinese":
+                print("  排除：文件名包含中文", flush=True)
+            elif exclude_reason == "bad_name_pattern":
+                print("  排除：文件名不符合 Author-YYYY-Title 规范", flush=True)
+            elif exclude_reason == "page_count_failed":
+                print("  排除：无法读取页数", flush=True)
+            elif exclude_reason.startswith("pages_gt_"):
+                print(f"  排除：页数 {pages} 超过 {MAX_PAGES}", flush=True)
+            elif exclude_reason.startswith("size_gt_"):
+                print("  排除：大小超过阈值", flush=True)
+            elif exclude_reason.startswith("chinese_pdf_vlm:"):
+                print("  排除：大模型检测为中文PDF", flush=True)
+        return "skipped", log_rows, exclude_reason.startswith("already_translated_by_metadata:")
+
+    # 只有在确定不跳过时才显示处理信息
+    print(f"\n[{idx}/{total_files}] 处理：{pdf_path.name}", flush=True)
 
-    for idx, pdf_path in enumerate(pdf_files, start=1):
-        stem = pdf_path.stem
-        size = pdf_path.stat().st_size
+    backup_path = pdf_path.with_name(f"{stem}_original.pdf")
+    mono_path = get_expected_mono_output_path(pdf_path)
+    final_path = pdf_path  # 覆盖回原名
+    pages = get_page_count(pdf_path)  # 重新获取页数信息
+
+    # —— 调用 pdf2zh：仅产中文 mono；不提取 exe 日志 ——
+    used_ocr = False
+    t0 = time.time()
+    ok, reason = execute_pdf2zh_translation(pdf_path, pdf_path.parent, enable_ocr=False)
+    duration = time.time() - t0
+    if not ok:
+        # 首次失败：尝试启用 OCR 回退
+        print(f"  首次翻译失败（{reason}），尝试启用 OCR 回退……", flush=True)
+        cleanup_new_csvs(pdf_path.parent, t0)
+        t1 = time.time()
+        ok, reason = execute_pdf2zh_translation(pdf_path, pdf_path.parent, enable_ocr=True)
+        duration = time.time() - t1
+        if not ok:
+            log("failed", pdf_path, reason=f"pdf2zh_failed:{reason}", pages=pages, size=size, duration=duration)
+            print(f"  失败：OCR 回退仍失败（{reason}）", flush=True)
+            cleanup_new_csvs(pdf_path.parent, t1)
+            return "failed", log_rows, False
+        used_ocr = True
+        cleanup_new_csvs(pdf_path.parent, t1)
+
+    # —— 找到 mono 输出 ——
+    if not mono_path.exists():
+        fallback = find_most_recent_matching_file(str(pdf_path.parent / f"{stem}*mono.pdf"))
+        if fallback:
+            mono_path = fallback
+        else:
+            # 未发现 mono，若尚未启用 OCR，则再尝试一次 OCR 回退
+            if not used_ocr:
+                print("  未找到 mono 输出，尝试启用 OCR 回退再生成……", flush=True)
+                t2 = time.time()
+                ok2, reason2 = execute_pdf2zh_translation(pdf_path, pdf_path.parent, enable_ocr=True)
+                cleanup_new_csvs(pdf_path.parent, t2)
+                if not ok2:
+                    log("failed", pdf_path, reason=f"mono_pdf_not_found_and_ocr_failed:{reason2}", pages=pages,
+                        size=size)
+                    print("  失败：OCR 回退仍未生成 mono", flush=True)
+                    return "failed", log_rows, False
+                # 再次定位 mono
+                if not mono_path.exists():
+                    fb2 = find_most_recent_matching_file(str(pdf_path.parent / f"{stem}*mono.pdf"))
+                    if fb2:
+                        mono_path = fb2
+                    else:
+                        log("failed", pdf_path, reason="mono_pdf_not_found_after_ocr", pages=pages, size=size)
+                        print("  失败：启用 OCR 后仍未找到 mono", flush=True)
+                        return "failed", log_rows, False
+                used_ocr = True
+            else:
+                log("failed", pdf_path, reason="mono_pdf_not_found", pages=pages, size=size)
+                print("  失败：未找到 mono 输出", flush=True)
+                return "failed", log_rows, False
 
-        # 使用新的统一排除检查函数
-        should_exclude, exclude_reason = should_exclude_from_processing(pdf_path, skip_keywords, failure_counts)
-        if should_exclude:
-            skipped += 1
-            # 获取页数信息用于日志记录
-            pages = get_page_count(pdf_path) if exclude_reason.startswith("pages_gt_") else None
-            log_row("skipped", pdf_path, reason=exclude_reason, size=size, pages=pages)
-
-            if not SUPPRESS_SKIPPED_OUTPUT:
-                print(f"\n[{idx}/{total_files}] 处理：{pdf_path.name}", flush=True)
-                if exclude_reason == "too_many_failures":
-                    print(f"  排除：该文件已累计失败 {failure_counts.get(str(pdf_path), 0)} 次，不再尝试。", flush=True)
-                elif exclude_reason == "is_backup_original":
-                    print("  排除：备份文件 *_original.pdf", flush=True)
-                elif exclude_reason == "is_generated_output":
-                    print("  排除：已生成的 mono/dual 文件", flush=True)
-                elif exclude_reason.startswith("already_translated_by_metadata:"):
-                    print("  排除：元数据显示已翻译", flush=True)
-                elif exclude_reason == "contains_exclusion_keywords":
-                    print("  排除：文件名包含排除关键词", flush=True)
-                elif exclude_reason == "backup_exists":
-                    print("  排除：已存在 *_original 备份", flush=True)
-                elif exclude_reason == "filename_contains_chinese":
-                    print("  排除：文件名包含中文", flush=True)
-                elif exclude_reason == "bad_name_pattern":
-                    print("  排除：文件名不符合 Author-YYYY-Title 规范", flush=True)
-                elif exclude_reason == "page_count_failed":
-                    print("  排除：无法读取页数", flush=True)
-                elif exclude_reason.startswith("pages_gt_"):
-                    print(f"  排除：页数 {pages} 超过 {MAX_PAGES}", flush=True)
-                elif exclude_reason.startswith("size_gt_"):
-                    print("  排除：大小超过阈值", flush=True)
-                elif exclude_reason.startswith("chinese_pdf_vlm:"):
-                    print("  排除：大模型检测为中文PDF", flush=True)
-            continue
+    # —— 备份原 PDF ——
+    try:
+        # 备份只需文件内容；copyfile 走平台快速复制路径，且不再额外复制时间戳/权限等属性
+        shutil.copyfile(pdf_path, backup_path)
 
-        # 只有在确定不跳过时才显示处理信息
-        print(f"\n[{idx}/{total_files}] 处理：{pdf_path.name}", flush=True)
+        # 为原始PDF备份添加最小元数据
+        original_meta_ok, original_meta_error = embed_minimal_metadata(backup_path)
+        if not original_meta_ok:
+            print(f"  警告：为原始PDF添加元数据失败：{original_meta_error}", flush=True)
+            # 记录元数据失败到日志
+            log("metadata_failed", pdf_path, reason=f"original_metadata_error:{original_meta_error}",
+                pages=pages, size=size, duration=duration)
 
-        backup_path = pdf_path.with_name(f"{stem}_original.pdf")
-        mono_path = get_expected_mono_output_path(pdf_path)
-        final_path = pdf_path  # 覆盖回原名
-        pages = get_page_count(pdf_path)  # 重新获取页数信息
+    except Exception as e:
+        log("failed", pdf_path, reason=f"backup_failed:{e}", pages=pages, size=size, duration=duration)
+        print("  失败：备份原文件出错", flush=True)
+        cleanup_new_csvs(pdf_path.parent, t0)
+        return "failed", log_rows, False
 
-        # —— 调用 pdf2zh：仅产中文 mono；不提取 exe 日志 ——
-        used_ocr = False
-        t0 = time.time()
-        ok, reason = execute_pdf2zh_translation(pdf_path, pdf_path.parent, enable_ocr=False)
-        duration = time.time() - t0
-        if not ok:
-            # 首次失败：尝试启用 OCR 回退
-            print(f"  首次翻译失败（{reason}），尝试启用 OCR 回退……", flush=True)
-            cleanup_new_csvs(pdf_path.parent, t0)
-            t1 = time.time()
-            ok, reason = execute_pdf2zh_translation(pdf_path, pdf_path.parent, enable_ocr=True)
-            duration = time.time() - t1
-            if not ok:
-                increment_and_write_failure(pdf_path, failure_counts, FAIL_LOG_PATH)
-                failed += 1
-                log_row("failed", pdf_path, reason=f"pdf2zh_failed:{reason}", pages=pages, size=size, duration=duration)
-                print(f"  失败：OCR 回退仍失败（{reason}）", flush=True)
-                cleanup_new_csvs(pdf_path.parent, t1)
-                continue
-            used_ocr = True
-            cleanup_new_csvs(pdf_path.parent, t1)
+    # —— 合并并覆盖原名 ——
+    try:
+        # 拼接时顺带记录页面尺寸，并在同一次保存中添加附件和点击标签
+        _, _, attach_error = merge_pdfs_preserve_annotations(
+            pdf_path, mono_path, final_path, gap=GAP, vertical_expansion=VERTICAL_EXPANSION,
+            original_pdf=backup_path)
 
-        # —— 找到 mono 输出 ——
-        if not mono_path.exists():
-            fallback = find_most_recent_matching_file(str(pdf_path.parent / f"{stem}*mono.pdf"))
-            if fallback:
-                mono_path = fallback
-            else:
-                # 未发现 mono，若尚未启用 OCR，则再尝试一次 OCR 回退
-                if not used_ocr:
-                    print("  未找到 mono 输出，尝试启用 OCR 回退再生成……", flush=True)
-                    t2 = time.time()
-                    ok2, reason2 = execute_pdf2zh_translation(pdf_path, pdf_path.parent, enable_ocr=True)
-                    cleanup_new_csvs(pdf_path.parent, t2)
-                    if not ok2:
-                        increment_and_write_failure(pdf_path, failure_counts, FAIL_LOG_PATH)
-                        failed += 1
-                        log_row("failed", pdf_path, reason=f"mono_pdf_not_found_and_ocr_failed:{reason2}", pages=pages,
-                                size=size)
-                        print("  失败：OCR 回退仍未生成 mono", flush=True)
-                        continue
-                    # 再次定位 mono
-                    if not mono_path.exists():
-                        fb2 = find_most_recent_matching_file(str(pdf_path.parent / f"{stem}*mono.pdf"))
-                        if fb2:
-                            mono_path = fb2
-                        else:
-                            increment_and_write_failure(pdf_path, failure_counts, FAIL_LOG_PATH)
-                            failed += 1
-                            log_row("failed", pdf_path, reason="mono_pdf_not_found_after_ocr", pages=pages, size=size)
-                            print("  失败：启用 OCR 后仍未找到 mono", flush=True)
-                            continue
-                    used_ocr = True
-                else:
-                    increment_and_write_failure(pdf_path, failure_counts, FAIL_LOG_PATH)
-                    failed += 1
-                    log_row("failed", pdf_path, reason="mono_pdf_not_found", pages=pages, size=size)
-                    print("  失败：未找到 mono 输出", flush=True)
-                    continue
+        # 如果启用了垂直拓展，输出提示信息
+        if VERTICAL_EXPANSION > 0:
+            print(f"  已启用垂直拓展：每页增加 {VERTICAL_EXPANSION}pt 高度以完整显示内容", flush=True)
 
-        # —— 备份原 PDF ——
-        try:
-            shutil.copy2(pdf_path, backup_path)
+        if attach_error:
+            print(f"  警告：添加附件失败：{attach_error}", flush=True)
+            # 记录附件失败到日志
+            log("attachment_failed", pdf_path, reason=f"attachment_error:{attach_error}", pages=pages,
+                size=size, duration=duration)
 
-            # 为原始PDF备份添加最小元数据
-            original_meta_ok, original_meta_error = embed_minimal_metadata(backup_path)
-            if not original_meta_ok:
-                print(f"  警告：为原始PDF添加元数据失败：{original_meta_error}", flush=True)
-                # 记录元数据失败到日志
-                log_row("metadata_failed", pdf_path, reason=f"original_metadata_error:{original_meta_error}",
-                        pages=pages, size=size, duration=duration)
+    except Exception as e:
+        log("failed", pdf_path, reason=f"merge_failed:{e}", pages=pages, size=size, duration=duration)
+        print("  失败：拼接/覆盖出错", flush=True)
+        cleanup_new_csvs(pdf_path.parent, t0)
+        return "failed", log_rows, False
 
+    # —— 清理 mono ——（成功后）
+    if DELETE_MONO_PDF or DELETE_ALL_EXCEPT_FINAL:
+        try:
+            mono_path.unlink()
+            print(f"  已删除中间文件：{mono_path.name}", flush=True)
         except Exception as e:
-            increment_and_write_failure(pdf_path, failure_counts, FAIL_LOG_PATH)
-            failed += 1
-            log_row("failed", pdf_path, reason=f"backup_failed:{e}", pages=pages, size=size, duration=duration)
-            print("  失败：备份原文件出错", flush=True)
-            cleanup_new_csvs(pdf_path.parent, t0)
-            continue
+            print(f"  警告：删除 mono 失败：{e}", flush=True)
 
-        # —— 合并并覆盖原名 ——
+    # —— 清理 original 备份 ——（成功后）
+    if DELETE_ALL_EXCEPT_FINAL:
         try:
-            # 获取原始PDF页面尺寸
-            source_sizes = extract_page_dimensions(pdf_path)
-            if not source_sizes:
-                print(f"  警告：无法获取原始PDF页面尺寸", flush=True)
-                source_sizes = []
+            backup_path.unlink()
+            print(f"  已删除备份文件：{backup_path.name}", flush=True)
+        except Exception as e:
+            print(f"  警告：删除 original 备份失败：{e}", flush=True)
 
-            merge_pdfs_preserve_annotations(pdf_path, mono_path, final_path, gap=GAP, vertical_expansion=VERTICAL_EXPANSION)
+    # —— 清理 exe 生成的 CSV ——（成功后）
+    cleanup_new_csvs(pdf_path.parent, t0)
 
-            # 如果启用了垂直拓展，输出提示信息
-            if VERTICAL_EXPANSION > 0:
-                print(f"  已启用垂直拓展：每页增加 {VERTICAL_EXPANSION}pt 高度以完整显示内容", flush=True)
+    if used_ocr:
+        log("dual_made_overwrite_ocr", pdf_path, reason="ok_ocr", pages=pages, size=size, duration=duration)
+        print(f"  完成（OCR 回退）：已覆盖保存为 {final_path.name}（备份：{backup_path.name}；用时 {duration:.1f}s）",
+              flush=True)
+    else:
+        log("dual_made_overwrite", pdf_path, reason="ok", pages=pages, size=size, duration=duration)
+        print(f"  完成：已覆盖保存为 {final_path.name}（备份：{backup_path.name}；用时 {duration:.1f}s）", flush=True)
+    return "done", log_rows, False
 
-            # 获取合并后PDF页面尺寸
-            result_sizes = extract_page_dimensions(final_path)
-            if not result_sizes:
-                print(f"  警告：无法获取合并后PDF页面尺寸", flush=True)
-                result_sizes = []
 
-            # 创建元数据
-            metadata = create_translation_metadata("translated", source_sizes, result_sizes, GAP)
+# 每处理多少个文件做一次完整的垃圾回收
+GC_INTERVAL = 50
+_processed_since_gc = 0
 
-            # 添加附件和点击标签
-            attach_ok, attach_error = embed_original_file_attachment(final_path, backup_path, metadata)
-            if not attach_ok:
-                print(f"  警告：添加附件失败：{attach_error}", flush=True)
-                # 记录附件失败到日志
-                log_row("attachment_failed", pdf_path, reason=f"attachment_error:{attach_error}", pages=pages,
-                        size=size, duration=duration)
 
-        except Exception as e:
-            increment_and_write_failure(pdf_path, failure_counts, FAIL_LOG_PATH)
-            failed += 1
-            log_row("failed", pdf_path, reason=f"merge_failed:{e}", pages=pages, size=size, duration=duration)
-            print("  失败：拼接/覆盖出错", flush=True)
-            cleanup_new_csvs(pdf_path.parent, t0)
-            continue
+def release_pdf_caches():
+    """
+    释放 MuPDF 内部缓存（资源存储），避免长时间批处理时内存持续增长；
+    每处理 GC_INTERVAL 个文件再执行一次 gc.collect()，回收循环引用的文档/页面对象
+    """
+    global _processed_since_gc
+    fitz.TOOLS.store_shrink(100)
+    _processed_since_gc += 1
+    if _processed_since_gc >= GC_INTERVAL:
+        _processed_since_gc = 0
+        gc.collect()
 
-        # —— 清理 mono ——（成功后）
-        if DELETE_MONO_PDF or DELETE_ALL_EXCEPT_FINAL:
-            try:
-                mono_path.unlink()
-                print(f"  已删除中间文件：{mono_path.name}", flush=True)
-            except Exception as e:
-                print(f"  警告：删除 mono 失败：{e}", flush=True)
 
-        # —— 清理 original 备份 ——（成功后）
-        if DELETE_ALL_EXCEPT_FINAL:
-            try:
-                backup_path.unlink()
-                print(f"  已删除备份文件：{backup_path.name}", flush=True)
-            except Exception as e:
-                print(f"  警告：删除 original 备份失败：{e}", flush=True)
+def process_single_pdf_and_release(*args) -> Tuple[str, List[List[str]], bool]:
+    """处理单个PDF（参数同 process_single_pdf），结束后无论成败都释放 MuPDF 缓存"""
+    try:
+        return process_single_pdf(*args)
+    finally:
+        release_pdf_caches()
 
-        # —— 清理 exe 生成的 CSV ——（成功后）
-        cleanup_new_csvs(pdf_path.parent, t0)
 
-        done += 1
-        if used_ocr:
-            log_row("dual_made_overwrite_ocr", pdf_path, reason="ok_ocr", pages=pages, size=size, duration=duration)
-            print(f"  完成（OCR 回退）：已覆盖保存为 {final_path.name}（备份：{backup_path.name}；用时 {duration:.1f}s）",
-                  flush=True)
+def main():
+    if not PDF2ZH_EXE.exists():
+        raise FileNotFoundError(f"找不到可执行文件：{PDF2ZH_EXE}")
+
+    failure_counts = read_failure_counts(FAIL_LOG_PATH)
+    skip_keywords = load_exclusion_keywords()  # 加载排除关键词
+
+    if skip_keywords:
+        print(f"已加载 {len(skip_keywords)} 个排除关键词：{', '.join(skip_keywords)}", flush=True)
+
+    # (路径, 文件大小, 修改时间)：取自目录项，后续检查无需再次 stat
+    pdf_files = []
+    for entry in iter_pdf_entries(PDF_ROOT):
+        st = entry.stat()
+        pdf_files.append((Path(entry.path), st.st_size, st.st_mtime_ns))
+
+    # 元数据清单：修改时间与大小未变且上次判定为已翻译的文件，无需再打开PDF读取元数据
+    manifest = read_translation_manifest(MANIFEST_PATH) if SKIP_TRANSLATED_BY_METADATA else {}
+
+    ensure_csv_header(LOG_PATH)
+    counters = {"done": 0, "skipped": 0, "failed": 0}
+    total_files = len(pdf_files)
+    print(f"发现 PDF 共 {total_files} 个，开始处理……", flush=True)
+
+    def collect(pdf_path: Path, size: int, mtime_ns: int, outcome: str, rows: List[List[str]],
+                translated: bool = False):
+        # 日志、失败计数与元数据清单只由主进程写入，避免多进程同时写同一文件
+        write_log_rows(rows)
+        if outcome == "failed":
+            increment_and_write_failure(pdf_path, failure_counts, FAIL_LOG_PATH)
+        if translated:
+            manifest[str(pdf_path)] = [mtime_ns, size]
         else:
-            log_row("dual_made_overwrite", pdf_path, reason="ok", pages=pages, size=size, duration=duration)
-            print(f"  完成：已覆盖保存为 {final_path.name}（备份：{backup_path.name}；用时 {duration:.1f}s）", flush=True)
+            manifest.pop(str(pdf_path), None)
+        counters[outcome] += 1
+
+    try:
+        if MAX_WORKERS <= 1:
+            for idx, (pdf_path, size, mtime_ns) in enumerate(pdf_files, start=1):
+                known_translated = manifest.get(str(pdf_path)) == [mtime_ns, size]
+                collect(pdf_path, size, mtime_ns,
+                        *process_single_pdf_and_release(idx, total_files, pdf_path, size, skip_keywords,
+                                                        failure_counts, known_translated))
+        else:
+            print(f"并行处理：{MAX_WORKERS} 个工作进程", flush=True)
+
+            def own_failure_count(pdf_path: Path) -> dict:
+                # 每个任务只需自身的失败计数，避免把整个计数表逐个序列化给子进程
+                key = str(pdf_path)
+                return {key: failure_counts[key]} if key in failure_counts else {}
+
+            with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                futures = {
+                    pool.submit(process_single_pdf_and_release, idx, total_files, pdf_path, size, skip_keywords,
+                                own_failure_count(pdf_path),
+                                manifest.get(str(pdf_path)) == [mtime_ns, size]): (pdf_path, size, mtime_ns)
+                    for idx, (pdf_path, size, mtime_ns) in enumerate(pdf_files, start=1)
+                }
+                for fut in as_completed(futures):
+                    pdf_path, size, mtime_ns = futures[fut]
+                    try:
+                        collect(pdf_path, size, mtime_ns, *fut.result())
+                    except Exception as e:
+                        collect(pdf_path, size, mtime_ns, "failed",
+                                [format_log_row("failed", pdf_path, reason=f"worker_failed:{e}")])
+                        print(f"  失败：{pdf_path.name} 处理进程异常（{e}）", flush=True)
+    finally:
+        if SKIP_TRANSLATED_BY_METADATA:
+            # 只保留本次扫描到的文件；中途中断时，尚未处理文件的原有记录保持不变
+            scanned = {str(pdf_path) for pdf_path, _, _ in pdf_files}
+            write_translation_manifest(MANIFEST_PATH, {k: v for k, v in manifest.items() if k in scanned})
 
-    print(f"\n处理完成：生成 {done} 个，跳过 {skipped} 个，失败 {failed} 个。日志：{LOG_PATH}", flush=True)
+    close_log_writer()
+    print(f"\n处理完成：生成 {counters['done']} 个，跳过 {counters['skipped']} 个，失败 {counters['failed']} 个。日志：{LOG_PATH}",
+          flush=True)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
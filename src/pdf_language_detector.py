@@ -12,42 +12,46 @@ PDF语言检测工具
 - 基于多数投票原则确定整体语言
 
 依赖：
-- PyMuPDF: PDF处理和渲染
-- Pillow: 图像处理
-- requests: HTTP请求
+- PyMuPDF: PDF处理、渲染和JPEG编码
+- httpx: 异步HTTP请求
 - openai: API客户端
 """
 
-import io
 import re
 import os
 import base64
 import random
-from typing import List, Dict, Any, Optional
+import asyncio
+import multiprocessing
+from collections import Counter
+from contextlib import nullcontext
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 import json
 
 import fitz  # PyMuPDF
-from PIL import Image
-import requests
+import httpx
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
     _HAS_OPENAI_SDK = True
 except ImportError:
     _HAS_OPENAI_SDK = False
 
 
 # ======== 配置管理 ========
+@lru_cache(maxsize=1)
 def load_configuration() -> Dict[str, Any]:
-    """从配置文件加载设置参数"""
+    """从配置文件加载设置参数（结果缓存，同一进程内只读取一次）"""
     config_path = Path(__file__).parent.parent / "configs" / "config.json"
     if not config_path.exists():
         raise FileNotFoundError(f"配置文件不存在：{config_path}")
     
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        # 一次性按字节读入，由 json 自行识别 UTF-8 编码（可兼容带 BOM 的文件）
+        return json.loads(config_path.read_bytes())
     except Exception as e:
         raise RuntimeError(f"读取配置文件失败：{e}")
 
@@ -83,16 +87,80 @@ SILICONFLOW_API_KEY = get_config_value(CONFIG, "vlm_api_key", "SILICONFLOW_API_K
 SILICONFLOW_MODEL   = CONFIG["vlm_model"]
 SILICONFLOW_BASE    = CONFIG["vlm_base"]
 
-# 模型特定配置
+# 单个PDF检测时同时在途的VLM请求数上限
+VLM_MAX_CONCURRENCY = 5
+
+# 页面图像JPEG质量：仅用于判断“是否中文”，较低质量即可，显著减小上传体积
+VLM_JPEG_QUALITY = 60
+# 以灰度渲染页面：判断语言无需色彩，单通道JPEG体积明显更小
+VLM_GRAYSCALE = CONFIG.get("vlm_grayscale", False)
+# detail=low 时服务端会缩小图像，渲染DPI超过此值只会白白增加上传体积
+LOW_DETAIL_MAX_DPI = 110
+
+# 并行渲染页面的进程数（PyMuPDF 不支持多线程，并行渲染需使用多进程，各进程自行打开文档）
+VLM_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+_RENDER_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """获取（首次调用时创建）跨PDF复用的页面渲染进程池，摊薄进程启动开销"""
+    global _RENDER_POOL
+    if _RENDER_POOL is None:
+        _RENDER_POOL = ProcessPoolExecutor(max_workers=VLM_RENDER_WORKERS)
+    return _RENDER_POOL
+
+# ======== HTTP连接复用 ========
+# VLM请求遇到限流（429）或服务端错误（5xx）时的重试次数与指数退避基数（秒）
+VLM_MAX_RETRIES = 3
+VLM_RETRY_BACKOFF = 0.5
+VLM_RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+
+# 进程内复用的事件循环与异步客户端：跨页面/跨PDF保持连接池（TCP+TLS连接不必每个文件重新握手）
+# 异步客户端的连接绑定在创建它的事件循环上，因此事件循环也需复用，而不是每次 asyncio.run
+_VLM_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_VLM_CLIENTS: Dict[tuple, Any] = {}
+
+
+def get_vlm_loop() -> asyncio.AbstractEventLoop:
+    """获取（首次调用时创建）本进程复用的事件循环"""
+    global _VLM_LOOP
+    if _VLM_LOOP is None:
+        _VLM_LOOP = asyncio.new_event_loop()
+    return _VLM_LOOP
+
+
+def get_vlm_client(api_key: str, base_url: str):
+    """
+    获取（首次调用时创建）本进程复用的异步VLM客户端，按 (api_key, base_url) 缓存
+    有 OpenAI SDK 时使用 AsyncOpenAI（SDK 自带 429/5xx 退避重试），否则使用 httpx.AsyncClient
+    """
+    key = (api_key, base_url)
+    client = _VLM_CLIENTS.get(key)
+    if client is None:
+        if _HAS_OPENAI_SDK:
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=VLM_MAX_RETRIES)
+        else:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+                transport=httpx.AsyncHTTPTransport(retries=VLM_MAX_RETRIES),
+            )
+        _VLM_CLIENTS[key] = client
+    return client
+
+
+# 模型特定配置（max_images：单次请求可携带的页面图片数，未列出的模型按1张处理）
 MODEL_HINTS = {
     "deepseek-ai/deepseek-vl2": {
-        "note": "建议单次处理不超过2张图片，超出会自动缩放"
+        "note": "建议单次处理不超过2张图片，超出会自动缩放",
+        "max_images": 2,
     },
     "THUDM/GLM-4.1V-9B-Thinking": {
-        "note": "支持detail参数，可能产生思考风格输出"
+        "note": "支持detail参数，可能产生思考风格输出",
+        "max_images": 5,
     },
     "Qwen/Qwen2.5-VL-32B-Instruct": {
-        "note": "支持detail参数，高分辨率会增加token消耗"
+        "note": "支持detail参数，高分辨率会增加token消耗",
+        "max_images": 5,
     },
 }
 
@@ -102,129 +170,265 @@ PROMPT_CN = (
     "判断PDF页面的主要语言是中文还是非中文。\n"
     "只输出：中文 或 非中文"
 )
+PROMPT_CN_MULTI = (
+    "依次判断以上{n}张PDF页面图片各自的主要语言是中文还是非中文。\n"
+    "每行输出一张图片的结果，共{n}行，每行只输出：中文 或 非中文"
+)
 
 
 def render_page_to_jpeg_base64(doc: fitz.Document, page_index: int,
-                                dpi: int = 150, jpeg_quality: int = 85) -> str:
-    """将PDF页面渲染为JPEG格式的Base64编码"""
+                                dpi: int = 150, jpeg_quality: int = VLM_JPEG_QUALITY,
+                                grayscale: bool = VLM_GRAYSCALE) -> str:
+    """将PDF页面渲染为JPEG格式的Base64编码（grayscale=True 时渲染为单通道灰度图）"""
     page = doc.load_page(page_index)
     zoom = dpi / 72.0
     mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat, alpha=False)
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+    # 直接使用 PyMuPDF 内置的 libjpeg 编码，省去 Pillow 的像素拷贝与缓冲
+    # Base64 输出必为ASCII，按 ascii 解码即可（无需 UTF-8 校验）
+    return base64.b64encode(pix.tobytes("jpeg", jpg_quality=jpeg_quality)).decode("ascii")
 
-    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=jpeg_quality, optimize=True)
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
 
+def render_pdf_file_page_to_jpeg_base64(pdf_path: str, page_index: int,
+                                        dpi: int = 150, jpeg_quality: int = VLM_JPEG_QUALITY,
+                                        grayscale: bool = VLM_GRAYSCALE) -> str:
+    """按路径打开PDF并渲染指定页面（在渲染进程中执行）"""
+    with fitz.open(pdf_path) as doc:
+        return render_page_to_jpeg_base64(doc, page_index, dpi=dpi, jpeg_quality=jpeg_quality,
+                                          grayscale=grayscale)
 
-def build_vlm_request_message(image_b64: str, detail: str = "low") -> List[Dict[str, Any]]:
+
+def build_vlm_request_message(image_b64: Union[str, List[str]], detail: str = "low") -> List[Dict[str, Any]]:
     """构建VLM请求消息结构"""
     """
     统一构造 VLM 输入消息（图片 + 文本）。
     支持 detail: low/high/auto（见官方说明）。:contentReference[oaicite:4]{index=4}
+    image_b64 为列表时，将多张页面图片放入同一条消息，要求模型逐行给出结果。
     """
+    images = [image_b64] if isinstance(image_b64, str) else image_b64
+    prompt = PROMPT_CN if len(images) == 1 else PROMPT_CN_MULTI.format(n=len(images))
     return [
         {
             "type": "image_url",
             "image_url": {
-                "url": f"data:image/jpeg;base64,{image_b64}",
+                "url": f"data:image/jpeg;base64,{b64}",
                 "detail": detail
             },
-        },
-        {"type": "text", "text": PROMPT_CN},
-    ]
-
-
-def call_vlm_via_openai_sdk(image_b64: str,
-                          api_key: str,
-                          base_url: str,
-                          model: str,
-                          detail: str = "low",
-                          timeout: int = 60) -> str:
-    """通过OpenAI SDK调用VLM服务"""
-    client = OpenAI(api_key=api_key, base_url=base_url)
-    
+        }
+        for b64 in images
+    ] + [{"type": "text", "text": prompt}]
+
+
+async def call_vlm_via_openai_sdk_async(client: "AsyncOpenAI",
+                                        image_b64: Union[str, List[str]],
+                                        model: str,
+                                        detail: str = "low",
+                                        timeout: int = 60) -> str:
+    """通过OpenAI SDK异步客户端调用VLM服务"""
     # GLM-4.1V-9B-Thinking 需要特殊参数和更长的输出
     if "GLM-4.1V-9B-Thinking" in model:
-        resp = client.chat.completions.create(
-            model=model,
-            temperature=0.7,
-            max_tokens=512,
-            messages=[
-                {"role": "system", "content": SYSTEM_BRIEF},
-                {"role": "user", "content": build_vlm_request_message(image_b64, detail=detail)},
-            ],
-        )
+        temperature, max_tokens = 0.7, 512
     else:
-        resp = client.chat.completions.create(
-            model=model,
-            temperature=0,
-            max_tokens=16,
-            messages=[
-                {"role": "system", "content": SYSTEM_BRIEF},
-                {"role": "user", "content": build_vlm_request_message(image_b64, detail=detail)},
-            ],
-            timeout=timeout,
-        )
+        temperature, max_tokens = 0, 16
+    # 多图请求按图片数放大输出长度
+    if not isinstance(image_b64, str):
+        max_tokens *= len(image_b64)
+
+    resp = await client.chat.completions.create(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        messages=[
+            {"role": "system", "content": SYSTEM_BRIEF},
+            {"role": "user", "content": build_vlm_request_message(image_b64, detail=detail)},
+        ],
+        timeout=timeout,
+    )
     return (resp.choices[0].message.content or "").strip()
 
 
-def call_vlm_via_http_requests(image_b64: str,
-                             api_key: str,
-                             base_url: str,
-                             model: str,
-                             detail: str = "low",
-                             timeout: int = 60) -> str:
-    """通过HTTP请求调用VLM服务"""
+async def call_vlm_via_httpx_async(client: httpx.AsyncClient,
+                                   image_b64: Union[str, List[str]],
+                                   api_key: str,
+                                   base_url: str,
+                                   model: str,
+                                   detail: str = "low",
+                                   timeout: int = 60) -> str:
+    """通过httpx异步客户端调用VLM服务"""
     url = f"{base_url.rstrip('/')}/chat/completions"
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    
+
     # GLM-4.1V-9B-Thinking 需要更长的输出和不同的温度设置
     if "GLM-4.1V-9B-Thinking" in model:
-        payload = {
-            "model": model,
-            "temperature": 0.7,
-            "max_tokens": 512,
-            "messages": [
-                {"role": "system", "content": SYSTEM_BRIEF},
-                {"role": "user", "content": build_vlm_request_message(image_b64, detail=detail)},
-            ],
-        }
+        temperature, max_tokens = 0.7, 512
     else:
-        payload = {
-            "model": model,
-            "temperature": 0,
-            "max_tokens": 16,
-            "messages": [
-                {"role": "system", "content": SYSTEM_BRIEF},
-                {"role": "user", "content": build_vlm_request_message(image_b64, detail=detail)},
-            ],
-        }
-    
-    r = requests.post(url, json=payload, headers=headers, timeout=timeout)
+        temperature, max_tokens = 0, 16
+    # 多图请求按图片数放大输出长度
+    if not isinstance(image_b64, str):
+        max_tokens *= len(image_b64)
+
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "messages": [
+            {"role": "system", "content": SYSTEM_BRIEF},
+            {"role": "user", "content": build_vlm_request_message(image_b64, detail=detail)},
+        ],
+    }
+
+    # 连接错误由 transport 重试；限流与服务端错误在此按指数退避重试
+    for attempt in range(VLM_MAX_RETRIES + 1):
+        r = await client.post(url, json=payload, headers=headers, timeout=timeout)
+        if r.status_code not in VLM_RETRY_STATUS or attempt == VLM_MAX_RETRIES:
+            break
+        await asyncio.sleep(VLM_RETRY_BACKOFF * (2 ** attempt))
     r.raise_for_status()
     j = r.json()
     return (j["choices"][0]["message"]["content"] or "").strip()
 
 
+async def classify_pages_async(doc: fitz.Document,
+                               indices: List[int],
+                               dpi: int,
+                               model: str,
+                               api_key: str,
+                               base_url: str,
+                               detail: str = "low",
+                               per_page_timeout: int = 60,
+                               max_concurrency: int = VLM_MAX_CONCURRENCY,
+                               early_stop: bool = True) -> List[Dict[str, Any]]:
+    """
+    并发地对指定页面进行语言判定，返回与 indices 顺序一致的逐页结果。
+    early_stop 为 True 时，一旦剩余页面无法改变多数票结论即取消其余请求，
+    此时返回的结果只包含已完成的页面。
+
+    按模型的 max_images 将多页打包进同一请求，减少往返次数；批量结果无法解析时逐页重试。
+    early_stop 时每批最多装入过半数的页面，保证至少分成两个请求，提前结束才能生效。
+    文档来自磁盘文件时，页面在渲染进程池中并行渲染；否则在单线程执行器中串行渲染
+    （fitz.Document 非线程安全）。渲染与在途的VLM请求相互重叠；信号量限制同时在途的请求数。
+    """
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+    batch_size = max(1, MODEL_HINTS.get(model, {}).get("max_images", 1))
+    if early_stop:
+        # 所有页面打包成一个请求时提前结束无从生效：首批只装入过半数的页面，
+        # 其结果一致时即可确定多数票结论并取消其余请求
+        batch_size = min(batch_size, len(indices) // 2 + 1)
+    batches = [indices[i:i + batch_size] for i in range(0, len(indices), batch_size)]
+
+    # 已在工作进程中（如批处理的多进程并行）时不再嵌套创建进程池
+    pdf_file = doc.name if doc.name and os.path.isfile(doc.name) else ""
+    if pdf_file and VLM_RENDER_WORKERS > 1 and len(indices) > 1 and multiprocessing.parent_process() is None:
+        render_ctx = nullcontext(get_render_pool())
+        render_fn, render_src = render_pdf_file_page_to_jpeg_base64, pdf_file
+    else:
+        render_ctx = ThreadPoolExecutor(max_workers=1)
+        render_fn, render_src = render_page_to_jpeg_base64, doc
+
+    client = get_vlm_client(api_key, base_url)
+
+    async def call_vlm(images: Union[str, List[str]]) -> str:
+        async with sem:
+            if _HAS_OPENAI_SDK:
+                return await call_vlm_via_openai_sdk_async(
+                    client, images, model=model, detail=detail, timeout=per_page_timeout
+                )
+            return await call_vlm_via_httpx_async(
+                client, images, api_key=api_key, base_url=base_url,
+                model=model, detail=detail, timeout=per_page_timeout
+            )
+
+    async def classify_batch(render_pool, batch: List[int]) -> List[Dict[str, Any]]:
+        images = await asyncio.gather(*(
+            loop.run_in_executor(render_pool, render_fn, render_src, idx, dpi, VLM_JPEG_QUALITY)
+            for idx in batch
+        ))
+        if len(batch) > 1:
+            raw = await call_vlm(list(images))
+            labels = parse_batch_language_labels(raw, len(batch))
+            if labels is not None:
+                return [{"page": idx, "label": label, "raw": raw} for idx, label in zip(batch, labels)]
+
+        results = []
+        for idx, b64 in zip(batch, images):
+            raw = await call_vlm(b64)
+            results.append({"page": idx, "label": normalize_language_label(raw), "raw": raw})
+        return results
+
+    page_results: List[Dict[str, Any]] = []
+    remaining = len(indices)
+    with render_ctx as render_pool:
+        tasks = [asyncio.ensure_future(classify_batch(render_pool, b)) for b in batches]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                results = await fut
+                page_results.extend(results)
+                remaining -= len(results)
+                counts = Counter(r["label"] for r in page_results)
+                if early_stop and remaining and is_vote_decided(counts["中文"], counts["非中文"], remaining):
+                    break
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    order = {idx: i for i, idx in enumerate(indices)}
+    page_results.sort(key=lambda r: order[r["page"]])
+    return page_results
+
+
+def is_vote_decided(count_zh: int, count_nonzh: int, remaining: int) -> bool:
+    """剩余 remaining 页无论结果如何都不会改变多数票结论（非中文 > 中文 才判为非中文）时返回 True"""
+    return count_nonzh > count_zh + remaining or count_zh >= count_nonzh + remaining
+
+
+# 语言标签匹配规则（预编译，忽略大小写，避免对长输出做 lower() 拷贝）
+NON_CHINESE_LABEL_PATTERN = re.compile(r"非中文|non-chinese|英文|english", re.IGNORECASE)
+CHINESE_LABEL_PATTERN = re.compile(r"中文|chinese", re.IGNORECASE)
+CJK_IDEOGRAPH_PATTERN = re.compile(r"[\u4e00-\u9fff]")
+
+
+LABEL_TOKEN_PATTERN = re.compile(r"非中文|non-chinese|英文|english|中文|chinese", re.IGNORECASE)
+THINK_BLOCK_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+
+
+def parse_batch_language_labels(text: str, n: int) -> Optional[List[str]]:
+    """
+    解析多图请求的返回结果，按顺序得到 n 个语言标签。
+    去掉思考过程后取最后 n 个标签词；数量不足时返回 None（由调用方逐页重试）。
+    """
+    tokens = LABEL_TOKEN_PATTERN.findall(THINK_BLOCK_PATTERN.sub("", text or ""))
+    if len(tokens) < n:
+        return None
+    return [normalize_language_label(tok) for tok in tokens[-n:]]
+
+
 def normalize_language_label(text: str) -> str:
     """标准化语言标签"""
     t = (text or "").strip()
-    tl = t.lower()
     # 先看明确词
-    if "非中文" in t or "non-chinese" in tl or "英文" in t or "english" in tl:
+    if NON_CHINESE_LABEL_PATTERN.search(t):
         return "非中文"
-    if "中文" in t or "chinese" in tl:
+    if CHINESE_LABEL_PATTERN.search(t):
         return "中文"
     # 兜底：是否含有中日韩统一表意文字
-    return "中文" if re.search(r"[\u4e00-\u9fff]", t) else "非中文"
+    return "中文" if CJK_IDEOGRAPH_PATTERN.search(t) else "非中文"
+
+
+def sample_page_indices(n: int, k: int) -> List[int]:
+    """
+    分层抽样 k 个页码：将 [0, n) 均分为 k 段，每段随机取一页。
+    保证抽样覆盖前言/正文/附录各部分，且页码互不重复、按升序排列。
+    """
+    return [random.randrange(i * n // k, (i + 1) * n // k) for i in range(k)]
 
 
-def detect_pdf_language_via_vlm(pdf_path: str,
+def detect_pdf_language_via_vlm(pdf_path: Union[str, fitz.Document],
                                 k_pages: int = 5,
                                 dpi: int = 150,
                                 seed: Optional[int] = None,
@@ -232,9 +436,14 @@ def detect_pdf_language_via_vlm(pdf_path: str,
                                 api_key: str = SILICONFLOW_API_KEY,
                                 base_url: str = SILICONFLOW_BASE,
                                 detail: str = "low",
-                                per_page_timeout: int = 60) -> Dict[str, Any]:
+                                per_page_timeout: int = 60,
+                                max_concurrency: int = VLM_MAX_CONCURRENCY,
+                                early_stop: bool = True) -> Dict[str, Any]:
     """
-    使用 VLM 对 PDF 的随机 k 页进行语言判定（中文/非中文），并给出多数票结论。
+    使用 VLM 对 PDF 分层随机抽取的 k 页进行语言判定（中文/非中文），并给出多数票结论。
+    各页请求并发发出，max_concurrency 限制同时在途的请求数。
+    pdf_path 也可以直接传入已打开的 fitz.Document（由调用方负责关闭），避免重复解析。
+    early_stop: 多数票结论已确定时不再等待其余页面（page_results 只含已完成的页面）。
     兼容模型:
         - deepseek-ai/deepseek-vl2
         - THUDM/GLM-4.1V-9B-Thinking
@@ -247,10 +456,11 @@ def detect_pdf_language_via_vlm(pdf_path: str,
 
     if detail not in ("low", "high", "auto"):
         raise ValueError("detail 必须为 'low' / 'high' / 'auto'")
+    if detail == "low":
+        dpi = min(dpi, LOW_DETAIL_MAX_DPI)
 
-    call_vlm = (call_vlm_via_openai_sdk if _HAS_OPENAI_SDK else call_vlm_via_http_requests)
-
-    with fitz.open(pdf_path) as doc:
+    doc_ctx = nullcontext(pdf_path) if isinstance(pdf_path, fitz.Document) else fitz.open(pdf_path)
+    with doc_ctx as doc:
         n = doc.page_count
         if n == 0:
             return {
@@ -264,26 +474,16 @@ def detect_pdf_language_via_vlm(pdf_path: str,
             }
 
         k = min(k_pages, n)
-        indices = random.sample(range(n), k)
+        indices = sample_page_indices(n, k)
 
-        page_results: List[Dict[str, Any]] = []
-        count_zh = 0
-        count_nonzh = 0
-
-        for idx in indices:
-            b64 = render_page_to_jpeg_base64(doc, idx, dpi=dpi, jpeg_quality=85)
-            raw = call_vlm(
-                b64, api_key=api_key, base_url=base_url,
-                model=model, detail=detail, timeout=per_page_timeout
-            )
-            label = normalize_language_label(raw)
-            (count_zh if label == "中文" else count_nonzh)  # no-op to avoid linter warnings
-            if label == "中文":
-                count_zh += 1
-            else:
-                count_nonzh += 1
-            page_results.append({"page": idx, "label": label, "raw": raw})
+        page_results = get_vlm_loop().run_until_complete(classify_pages_async(
+            doc, indices, dpi=dpi, model=model, api_key=api_key, base_url=base_url,
+            detail=detail, per_page_timeout=per_page_timeout, max_concurrency=max_concurrency,
+            early_stop=early_stop
+        ))
 
+        counts = Counter(r["label"] for r in page_results)
+        count_zh, count_nonzh = counts["中文"], counts["非中文"]
         pdf_language = "非中文" if count_nonzh > count_zh else "中文"
 
         return {
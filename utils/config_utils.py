@@ -7,19 +7,21 @@
 
 import os
 import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Optional
 
 
+@lru_cache(maxsize=1)
 def load_configuration() -> Dict[str, Any]:
-    """从配置文件加载设置参数"""
+    """从配置文件加载设置参数（结果缓存，同一进程内只读取一次）"""
     config_path = Path(__file__).parent.parent / "configs" / "config.json"
     if not config_path.exists():
         raise FileNotFoundError(f"配置文件不存在：{config_path}")
     
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        # 一次性按字节读入，由 json 自行识别 UTF-8 编码（可兼容带 BOM 的文件）
+        return json.loads(config_path.read_bytes())
     except Exception as e:
         raise RuntimeError(f"读取配置文件失败：{e}")
 
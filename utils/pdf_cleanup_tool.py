@@ -13,6 +13,32 @@ PDF批处理工具 - 清理旁路文件
 import os
 from pathlib import Path
 
+# 要删除的旁路文件名后缀，以及临时输入文件的前缀（匹配时统一转为小写）
+SIDECAR_SUFFIXES = (".pdf2zh-updated.pdf", ".pdf2zh-merged.pdf")
+TEMP_INPUT_PREFIX = "__temp_input_"
+
+
+def is_sidecar_file_name(name):
+    """判断文件名是否为需要清理的旁路文件或临时输入文件"""
+    lower_name = name.lower()
+    if lower_name.endswith(SIDECAR_SUFFIXES):
+        return True
+    return lower_name.startswith(TEMP_INPUT_PREFIX) and lower_name.endswith(".pdf")
+
+
+def iter_sidecar_entries(root):
+    """递归遍历目录一次，逐个产出旁路文件的目录项"""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_sidecar_entries(entry.path)
+            elif is_sidecar_file_name(entry.name) and entry.is_file():
+                yield entry
+
 def cleanup_sidecar_files(root_path=None):
     """
     清理PDF翻译过程中产生的旁路文件
@@ -32,23 +58,17 @@ def cleanup_sidecar_files(root_path=None):
     
     print(f"正在扫描 {root_path}...")
     
-    # 定义要删除的文件模式
-    patterns = [
-        "*.pdf2zh-updated.pdf", 
-        "*.pdf2zh-merged.pdf",
-        "__temp_input_*.pdf"
-    ]
-    
-    for pattern in patterns:
-        for file_path in root_path.rglob(pattern):
-            try:
-                file_size = file_path.stat().st_size
-                size_freed += file_size
-                file_path.unlink()
-                print(f"已删除: {file_path.relative_to(root_path)} ({file_size} bytes)")
-                count += 1
-            except Exception as e:
-                print(f"删除失败 {file_path.relative_to(root_path)}: {e}")
+    # 只遍历一次目录树，文件大小取自目录项缓存
+    for entry in iter_sidecar_entries(root_path):
+        rel_path = os.path.relpath(entry.path, root_path)
+        try:
+            file_size = entry.stat().st_size
+            os.unlink(entry.path)
+            size_freed += file_size
+            print(f"已删除: {rel_path} ({file_size} bytes)")
+            count += 1
+        except Exception as e:
+            print(f"删除失败 {rel_path}: {e}")
     
     print(f"\n清理完成：删除 {count} 个文件，释放 {size_freed:,} 字节")
     return count
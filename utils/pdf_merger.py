@@ -18,7 +18,6 @@ pip install pymupdf requests tqdm
 
 import os
 import re
-import tempfile
 from urllib.parse import urlparse
 
 import fitz  # PyMuPDF
@@ -33,9 +32,20 @@ OUTPUT_SUFFIX = "_merged"                # 输出文件名后缀
 GAP = 0                                  # 中缝间距（点），设为0时宽度翻倍
 # ========================================
 
+# 文件名清理：控制字符用 str.translate 一次删除，非法字符连续出现时合并为一个 _
+_CONTROL_CHARS_TABLE = dict.fromkeys(range(0x20))
+_WIN_ILLEGAL_CHARS_RE = re.compile(r'[<>:"/\\|?*]+')
+
+# 复用同一个 HTTP 会话，多个 URL 之间共享连接池，避免重复建立 TLS 连接
+_HTTP_SESSION = requests.Session()
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 下载分块大小（1 MB）
+
 
 def is_valid_url(path: str) -> bool:
     """检查字符串是否为有效的URL地址"""
+    # 本地路径不含 "://"，直接判定，省去 urlparse 的解析开销
+    if "://" not in path[:16]:
+        return False
     try:
         p = urlparse(path)
         return p.scheme in ("http", "https")
@@ -43,32 +53,29 @@ def is_valid_url(path: str) -> bool:
         return False
 
 
-def download_url_to_temporary_file(url: str) -> str:
-    """下载URL内容到临时文件，返回本地文件路径。"""
-    r = requests.get(url, stream=True, timeout=60)
-    r.raise_for_status()
-    total = int(r.headers.get("content-length", 0))
-    suffix = os.path.splitext(urlparse(url).path)[-1] or ".pdf"
-    fd, tmp_path = tempfile.mkstemp(suffix=suffix)
-    os.close(fd)
+def download_url_to_memory(url: str) -> bytearray:
+    """下载URL内容到内存，返回文件内容（直接交给 PyMuPDF 打开，无需落地临时文件）。"""
+    with _HTTP_SESSION.get(url, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        total = int(r.headers.get("content-length", 0))
+        name = os.path.basename(urlparse(url).path) or "download.pdf"
+        buf = bytearray()
 
-    with open(tmp_path, "wb") as f, tqdm(
-        total=total if total > 0 else None,
-        unit="B", unit_scale=True, desc=f"Downloading {os.path.basename(tmp_path)}"
-    ) as bar:
-        for chunk in r.iter_content(chunk_size=1024 * 64):
-            if chunk:
-                f.write(chunk)
-                bar.update(len(chunk))
-    return tmp_path
+        with tqdm(
+            total=total if total > 0 else None,
+            unit="B", unit_scale=True, desc=f"Downloading {name}"
+        ) as bar:
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    buf.extend(chunk)
+                    bar.update(len(chunk))
+    return buf
 
 
 def open_pdf_document(maybe_url_or_path: str):
-    """打开PDF文档，支持本地路径或URL。返回PDF文档对象和临时文件路径。"""
-    tmp_file = None
+    """打开PDF文档，支持本地路径或URL（URL内容下载到内存后直接打开）。返回PDF文档对象。"""
     if is_valid_url(maybe_url_or_path):
-        tmp_file = download_url_to_temporary_file(maybe_url_or_path)
-        doc = fitz.open(tmp_file)
+        doc = fitz.open(stream=download_url_to_memory(maybe_url_or_path), filetype="pdf")
     else:
         doc = fitz.open(maybe_url_or_path)
 
@@ -76,14 +83,14 @@ def open_pdf_document(maybe_url_or_path: str):
         # 尝试使用空密码解密，失败则抛出异常
         if not doc.authenticate(""):
             raise ValueError(f"PDF 受密码保护，无法打开：{maybe_url_or_path}")
-    return doc, tmp_file
+    return doc
 
 
 def sanitize_filename_for_windows(name: str) -> str:
     """清理文件名中的非法字符，确保Windows系统兼容性。"""
     # 去除控制字符并替换 <>:"/\|?* 为 _
-    name = re.sub(r"[\x00-\x1f]", "", name)
-    name = re.sub(r'[<>:"/\\|?*]+', "_", name)
+    name = name.translate(_CONTROL_CHARS_TABLE)
+    name = _WIN_ILLEGAL_CHARS_RE.sub("_", name)
     # 去掉首尾空格与点
     name = name.strip(" .")
     return name or "output"
@@ -105,20 +112,26 @@ def generate_output_filename_from_source(left_src: str, suffix: str) -> str:
     return f"{stem}{suffix}.pdf"
 
 
+# 在导入时确定 fitz.Page 上可用的边界框设置方法，避免逐页 hasattr 探测
+_BOX_SETTERS = tuple(
+    name for name in ("set_mediabox", "set_cropbox", "set_trimbox", "set_bleedbox")
+    if hasattr(fitz.Page, name)
+)
+
+
 def _set_all_page_boxes(page: fitz.Page, rect: fitz.Rect):
     """设置页面的所有边界框，确保内容正确显示。"""
-    for setter in ("set_mediabox", "set_cropbox", "set_trimbox", "set_bleedbox"):
-        if hasattr(page, setter):
-            try:
-                getattr(page, setter)(rect)
-            except Exception:
-                pass
+    for setter in _BOX_SETTERS:
+        try:
+            getattr(page, setter)(rect)
+        except Exception:
+            pass
 
 
 def merge_pdfs_with_annotations_preserved(pdf_left: str, pdf_right: str, out_path: str, gap: float = 0):
     """横向合并两个PDF，保留左侧PDF的所有批注和链接"""
-    left_doc, left_tmp = open_pdf_document(pdf_left)
-    right_doc, right_tmp = open_pdf_document(pdf_right)
+    left_doc = open_pdf_document(pdf_left)
+    right_doc = open_pdf_document(pdf_right)
 
     try:
         if len(left_doc) != len(right_doc):
@@ -147,22 +160,17 @@ def merge_pdfs_with_annotations_preserved(pdf_left: str, pdf_right: str, out_pat
 
         # 3) 保存最终文件
         out_dir = os.path.dirname(os.path.abspath(out_path))
-        if out_dir and not os.path.exists(out_dir):
+        if out_dir:
             os.makedirs(out_dir, exist_ok=True)
 
-        out.save(out_path, garbage=4, deflate=True)
+        # 仅清理未引用对象，不做去重扫描，也不重写/重新压缩已有的内容流、图片和字体
+        out.save(out_path, garbage=1, deflate=True, clean=False, deflate_images=False, deflate_fonts=False)
         out.close()
         print(f"已生成：{out_path}")
 
     finally:
         left_doc.close()
         right_doc.close()
-        for tmp in (left_tmp, right_tmp):
-            if tmp and os.path.exists(tmp):
-                try:
-                    os.remove(tmp)
-                except Exception:
-                    pass
 
 
 if __name__ == "__main__":
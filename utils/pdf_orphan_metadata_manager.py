@@ -9,8 +9,7 @@ PDF元数据补全工具
 - 嵌入元数据JSON附件
 
 依赖：
-- PyMuPDF: PDF处理
-- Pillow: 图像处理
+- PyMuPDF: PDF处理、渲染和JPEG编码
 - requests: HTTP请求
 - openai: API客户端
 """
@@ -22,19 +21,23 @@ from pathlib import Path
 from typing import Any, Dict
 import argparse
 import random
-import time
-import io
 import base64
+import asyncio
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple, Union, Iterator
 
 import fitz  # PyMuPDF
-from PIL import Image
 import requests
 
+sys.path.append(str(Path(__file__).parent))
+from pdf_page_utils import get_page_sizes_pt
+
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
     _HAS_OPENAI_SDK = True
 except ImportError:
     _HAS_OPENAI_SDK = False
@@ -44,11 +47,16 @@ try:
     sys.path.append(str(Path(__file__).parent.parent / "src"))
     from pdf_language_detector import (
         load_configuration,
-        render_page_to_jpeg_base64,
-        build_vlm_request_message,
-        call_vlm_via_openai_sdk,
-        call_vlm_via_http_requests,
-        normalize_language_label
+        call_vlm_via_openai_sdk_async,
+        call_vlm_via_httpx_async,
+        normalize_language_label,
+        parse_batch_language_labels,
+        get_vlm_loop,
+        get_vlm_client as get_shared_vlm_client,
+        MODEL_HINTS,
+        VLM_MAX_CONCURRENCY,
+        VLM_GRAYSCALE,
+        VLM_JPEG_QUALITY
     )
     _HAS_VLM_DETECT = True
 except ImportError:
@@ -57,17 +65,22 @@ except ImportError:
 # 导入中文字符检测
 import re
 CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+# 规范文件名 Author-YYYY-Title：作者段不含数字且至少含一个字母，年份为1900-2099，标题段至少含一个字母
+# 仅用于纯ASCII文件名（re.ASCII 下 \d、[^\W\d_] 与 str.isdigit/isalpha 完全一致）；
+# 非ASCII文件名中的全角数字、罗马数字等与 str 方法判定不同，按字符逐段检查
+NORMALIZED_NAME_PATTERN = re.compile(r"[^-\d]*?[^\W\d_][^-\d]*-(?:19|20)\d{2}-.*?[^\W\d_]", re.DOTALL | re.ASCII)
 
 # ======== 配置管理 ========
+@lru_cache(maxsize=1)
 def load_configuration() -> Dict[str, Any]:
-    """从配置文件加载设置参数"""
+    """从配置文件加载设置参数（结果缓存，同一进程内只读取一次）"""
     config_path = Path(__file__).parent.parent / "configs" / "config.json"
     if not config_path.exists():
         raise FileNotFoundError(f"配置文件不存在：{config_path}")
     
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        # 一次性按字节读入，由 json 自行识别 UTF-8 编码（可兼容带 BOM 的文件）
+        return json.loads(config_path.read_bytes())
     except Exception as e:
         raise RuntimeError(f"读取配置文件失败：{e}")
 
@@ -109,6 +122,10 @@ VLM_K_PAGES = CONFIG["vlm_k_pages"]
 VLM_DPI = CONFIG["vlm_dpi"]
 VLM_DETAIL = CONFIG["vlm_detail"]
 VLM_PER_PAGE_TIMEOUT = CONFIG["vlm_per_page_timeout"]
+# 半页图像长边上限（像素）：判断语言无需更高分辨率，大幅面页面按此自动降低渲染DPI
+VLM_MAX_HALF_EDGE_PX = 1024
+# 并行处理的PDF数量（不超过CPU核数），为1时按顺序处理
+MAX_WORKERS = max(1, min(CONFIG.get("max_workers", 1), os.cpu_count() or 1))
 
 # ========== 跳过规则配置 (硬编码) ==========
 SKIP_FILENAME_CONTAINS_CHINESE = True      # 跳过文件名含中文的PDF
@@ -130,28 +147,48 @@ SKIP_KEYWORDS = [
     "pdf2zh-merged"
 ]
 
+# ========== 文本预判参数 (硬编码) ==========
+TEXT_MIN_CHARS = 100                      # 半页可提取的非空白字符少于此数时（如扫描件）交给VLM判定
+TEXT_CJK_RATIO_CHINESE = 0.3              # 中文字符占比不低于此值判为中文
+TEXT_CJK_RATIO_NON_CHINESE = 0.05         # 中文字符占比不高于此值判为非中文；介于两者之间交给VLM判定
+
+# ========== 扫描缓存 ==========
+# 记录上次判定为跳过的文件：{路径: [修改时间(ns), 文件大小, 跳过原因]}，修改时间与大小未变时直接沿用，无需再打开PDF
+SCAN_CACHE_NAME = ".pdf2zh_orphan_scan_cache.json"
+# 只缓存由文件本身决定的跳过原因；取决于跳过规则/关键词/上限设置、其他文件或可能是暂时性的原因，
+# 设置变更后结论可能不同，每次重新判定
+CACHEABLE_SKIP_REASONS = ("has_metadata", "is_backup", "is_generated")
+
 # ======== 工具函数 ========
 
 def iso_utc_now() -> str:
     """获取当前UTC时间的ISO格式字符串"""
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def open_pdf(pdf: Union[Path, str, fitz.Document]):
+    """
+    以上下文管理器形式打开PDF
+    传入路径时打开文件，退出时关闭；传入已打开的 fitz.Document 时原样使用，由调用方负责关闭
+    """
+    return nullcontext(pdf) if isinstance(pdf, fitz.Document) else fitz.open(pdf)
 
-def get_page_sizes(pdf_path: Path) -> List[Dict[str, float]]:
-    """获取PDF每页的尺寸信息（单位：pt）"""
+def get_page_sizes(pdf: Union[Path, str, fitz.Document]) -> List[Dict[str, float]]:
+    """
+    获取PDF每页的尺寸信息（单位：pt），可传入路径或已打开的文档
+    直接读取页面字典的 CropBox 与 Rotate（结果同 page.rect），不加载页面及其注释
+    """
     sizes = []
     try:
-        with fitz.open(pdf_path) as doc:
-            for page in doc:
-                rect = page.rect
-                sizes.append({"w": round(rect.width, 2), "h": round(rect.height, 2)})
+        with open_pdf(pdf) as doc:
+            sizes = get_page_sizes_pt(doc)
     except Exception as e:
         print(f"  警告：获取PDF页面尺寸失败：{e}")
     return sizes
 
-def has_metadata_attachment(pdf_path: Path) -> bool:
-    """检查PDF是否已有元数据附件"""
+def has_metadata_attachment(pdf: Union[Path, str, fitz.Document]) -> bool:
+    """检查PDF是否已有元数据附件，可传入路径或已打开的文档"""
     try:
-        with fitz.open(pdf_path) as doc:
+        with open_pdf(pdf) as doc:
             return "pdf2zh.meta.json" in doc.embfile_names()
     except Exception:
         return False
@@ -172,16 +209,16 @@ def create_metadata(status: str, model: str = DEFAULT_MODEL,
     
     return metadata
 
-def embed_metadata_attachment(pdf_path: Path, metadata: Dict[str, Any]) -> Tuple[bool, str]:
-    """为PDF嵌入元数据附件"""
+def embed_metadata_attachment(pdf: Union[Path, str, fitz.Document], metadata: Dict[str, Any]) -> Tuple[bool, str]:
+    """为PDF嵌入元数据附件并增量保存，可传入路径或已打开的文档"""
     try:
-        with fitz.open(pdf_path) as doc:
+        with open_pdf(pdf) as doc:
             # 如果已有同名附件则跳过
             if "pdf2zh.meta.json" in doc.embfile_names():
                 return True, "already_exists"
             
             # 创建附件内容
-            payload = json.dumps(metadata, ensure_ascii=False, indent=2).encode("utf-8")
+            payload = json.dumps(metadata, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
             
             # 添加附件
             doc.embfile_add("pdf2zh.meta.json", payload, desc="PDF2ZH metadata")
@@ -196,20 +233,123 @@ def embed_metadata_attachment(pdf_path: Path, metadata: Dict[str, Any]) -> Tuple
             
             # 保存修改
             doc.saveIncr()
-            
+        
         return True, "success"
         
     except Exception as e:
         return False, str(e)
 
-def split_image_horizontally(image: Image.Image) -> Tuple[Image.Image, Image.Image]:
-    """将图像水平分成左右两半"""
-    width, height = image.size
-    left_img = image.crop((0, 0, width // 2, height))
-    right_img = image.crop((width // 2, 0, width, height))
-    return left_img, right_img
+def split_pixmap_horizontally(pix: fitz.Pixmap) -> Tuple[fitz.Pixmap, fitz.Pixmap]:
+    """将渲染结果水平分成左右两半（直接拷贝像素，无需重新渲染或解码）"""
+    width, height = pix.width, pix.height
+    halves = []
+    for irect in (fitz.IRect(0, 0, width // 2, height), fitz.IRect(width // 2, 0, width, height)):
+        half = fitz.Pixmap(pix.colorspace, irect, False)
+        half.copy(pix, irect)
+        halves.append(half)
+    return halves[0], halves[1]
+
+def get_vlm_client():
+    """获取本进程复用的异步VLM客户端（与检测模块共用同一连接池与事件循环，含限流/服务端错误重试）"""
+    return get_shared_vlm_client(VLM_API_KEY, VLM_BASE)
+
+# 调用方式在模块加载时确定一次（OpenAI SDK 或 httpx），各请求直接调用，无需逐次判断
+if _HAS_OPENAI_SDK:
+    async def _call_vlm_async(client, payload, model: str) -> str:
+        return await call_vlm_via_openai_sdk_async(
+            client, payload, model=model, detail=VLM_DETAIL, timeout=VLM_PER_PAGE_TIMEOUT
+        )
+else:
+    async def _call_vlm_async(client, payload, model: str) -> str:
+        return await call_vlm_via_httpx_async(
+            client, payload, api_key=VLM_API_KEY, base_url=VLM_BASE,
+            model=model, detail=VLM_DETAIL, timeout=VLM_PER_PAGE_TIMEOUT
+        )
 
-def detect_translation_status_via_vlm(pdf_path: str, 
+async def classify_images_async(images: List[str], model: str,
+                                max_concurrency: Optional[int] = None) -> List[str]:
+    """
+    并发地对多张图片判定语言，返回与 images 顺序一致的标签列表
+    按模型的 max_images 将多张图片放进同一请求；各请求同时发出，信号量限制同时在途的请求数；
+    批量结果无法解析时逐张重试（同样并发）
+    max_concurrency 未传入时使用检测模块的 VLM_MAX_CONCURRENCY（在调用时读取，检测模块导入失败时本模块仍可导入）
+    """
+    if max_concurrency is None:
+        max_concurrency = VLM_MAX_CONCURRENCY
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+    batch_size = max(1, MODEL_HINTS.get(model, {}).get("max_images", 1))
+    batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+    client = get_vlm_client()
+
+    async def ask(payload) -> str:
+        async with sem:
+            return await _call_vlm_async(client, payload, model)
+
+    async def classify_batch(batch: List[str]) -> List[str]:
+        if len(batch) > 1:
+            batch_labels = parse_batch_language_labels(await ask(batch), len(batch))
+            if batch_labels is not None:
+                return batch_labels
+        raws = await asyncio.gather(*(ask(b64) for b64 in batch))
+        return [normalize_language_label(raw) for raw in raws]
+
+    results = await asyncio.gather(*(classify_batch(b) for b in batches))
+    return [label for batch_labels in results for label in batch_labels]
+
+def classify_images_via_vlm(images: List[str], model: str) -> List[str]:
+    """对多张图片判定语言（同步入口），返回与 images 顺序一致的标签列表"""
+    return get_vlm_loop().run_until_complete(classify_images_async(images, model))
+
+def classify_halves_via_vlm(doc: fitz.Document, indices: List[int], model: str, dpi: int) -> List[str]:
+    """渲染各页并分割为左右两半交给VLM判定，按 左、右、左、右…… 的顺序返回标签"""
+    # 先完成所有页面的渲染与分割，按 左、右、左、右…… 的顺序收集半页图像
+    halves: List[str] = []
+    for idx in indices:
+        # 渲染页面为像素图（只渲染一次，不经过中间JPEG）；按配置以灰度渲染时像素数据只有RGB的1/3
+        colorspace = fitz.csGRAY if VLM_GRAYSCALE else fitz.csRGB
+        page = doc[idx]
+        rect = page.rect
+        zoom = min(dpi / 72.0, VLM_MAX_HALF_EDGE_PX / max(rect.width / 2, rect.height, 1.0))
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=False)
+        
+        # 分割图像，每半只做一次JPEG编码（仅用于判断语言，与检测模块使用相同的较低质量）
+        for half_pix in split_pixmap_horizontally(pix):
+            halves.append(base64.b64encode(half_pix.tobytes("jpeg", jpg_quality=VLM_JPEG_QUALITY)).decode("ascii"))
+    
+    # 所有半页图像一并提交：按模型允许的图片数合并请求，各请求并发发出
+    return classify_images_via_vlm(halves, model)
+
+def classify_text_language(text: str) -> Optional[str]:
+    """按文本层中文字符占比判定语言；文本过少或占比不够明确时返回 None"""
+    # split() 在C层按空白切分，拼接后即为非空白字符
+    chars = len("".join(text.split()))
+    if chars < TEXT_MIN_CHARS:
+        return None
+    ratio = len(CJK_PATTERN.findall(text)) / chars
+    if ratio >= TEXT_CJK_RATIO_CHINESE:
+        return "中文"
+    if ratio <= TEXT_CJK_RATIO_NON_CHINESE:
+        return "非中文"
+    return None
+
+def classify_halves_by_text(doc: fitz.Document, indices: List[int]) -> Optional[List[str]]:
+    """
+    用文本层判定各页左右两半的语言，按 左、右、左、右…… 的顺序返回标签
+    任一半页无法明确判定时返回 None（由调用方交给VLM）
+    """
+    labels: List[str] = []
+    for idx in indices:
+        page = doc[idx]
+        rect = page.rect
+        mid = rect.x0 + rect.width / 2
+        for clip in (fitz.Rect(rect.x0, rect.y0, mid, rect.y1), fitz.Rect(mid, rect.y0, rect.x1, rect.y1)):
+            label = classify_text_language(page.get_text("text", clip=clip))
+            if label is None:
+                return None
+            labels.append(label)
+    return labels
+
+def detect_translation_status_via_vlm(pdf_path: Union[str, fitz.Document], 
                                      model: str = "THUDM/GLM-4.1V-9B-Thinking",
                                      k_pages: int = 3,
                                      dpi: int = 150) -> Tuple[bool, str]:
@@ -220,15 +360,13 @@ def detect_translation_status_via_vlm(pdf_path: str,
     - 如果右侧中文数 >= 左侧中文数 且 左侧非中文数 > 右侧非中文数，则为翻译版
     - 否则为未翻译版
     
+    各半页先按文本层判定，全部明确时不再调用VLM；扫描件等文本不足的情况才渲染页面交给VLM
+    pdf_path 也可以直接传入已打开的 fitz.Document（由调用方负责关闭），避免重复解析
+    
     返回: (是否为翻译版, 检测结果说明)
     """
-    if not _HAS_VLM_DETECT:
-        return False, "vlm_module_not_available"
-    
     try:
-        call_vlm = call_vlm_via_openai_sdk if _HAS_OPENAI_SDK else call_vlm_via_http_requests
-        
-        with fitz.open(pdf_path) as doc:
+        with open_pdf(pdf_path) as doc:
             n = doc.page_count
             if n == 0:
                 return False, "empty_pdf"
@@ -237,67 +375,26 @@ def detect_translation_status_via_vlm(pdf_path: str,
             k = min(k_pages, n)
             indices = random.sample(range(n), k)
             
-            left_chinese_count = 0
-            right_chinese_count = 0
-            left_non_chinese_count = 0
-            right_non_chinese_count = 0
+            # 文本层足以判定时直接得出结论，省去渲染与VLM请求
+            labels = classify_halves_by_text(doc, indices)
+            source = "text"
+            if labels is None:
+                if not _HAS_VLM_DETECT:
+                    return False, "vlm_module_not_available"
+                labels = classify_halves_via_vlm(doc, indices, model, dpi)
+                source = "vlm"
+            left_labels, right_labels = labels[0::2], labels[1::2]
             
-            for idx in indices:
-                # 渲染页面为图像
-                b64 = render_page_to_jpeg_base64(doc, idx, dpi=dpi, jpeg_quality=85)
-                
-                # 解码为PIL图像
-                image_data = base64.b64decode(b64)
-                image = Image.open(io.BytesIO(image_data))
-                
-                # 分割图像
-                left_img, right_img = split_image_horizontally(image)
-                
-                # 处理左侧图像
-                left_buf = io.BytesIO()
-                left_img.save(left_buf, format="JPEG", quality=85)
-                left_b64 = base64.b64encode(left_buf.getvalue()).decode("utf-8")
-                
-                left_result = call_vlm(
-                    left_b64, 
-                    api_key=VLM_API_KEY, 
-                    base_url=VLM_BASE,
-                    model=model,
-                    detail=VLM_DETAIL,
-                    timeout=VLM_PER_PAGE_TIMEOUT
-                )
-                left_label = normalize_language_label(left_result)
-                
-                if left_label == "中文":
-                    left_chinese_count += 1
-                else:
-                    left_non_chinese_count += 1
-                
-                # 处理右侧图像
-                right_buf = io.BytesIO()
-                right_img.save(right_buf, format="JPEG", quality=85)
-                right_b64 = base64.b64encode(right_buf.getvalue()).decode("utf-8")
-                
-                right_result = call_vlm(
-                    right_b64, 
-                    api_key=VLM_API_KEY, 
-                    base_url=VLM_BASE,
-                    model=model,
-                    detail=VLM_DETAIL,
-                    timeout=VLM_PER_PAGE_TIMEOUT
-                )
-                right_label = normalize_language_label(right_result)
-                
-                if right_label == "中文":
-                    right_chinese_count += 1
-                else:
-                    right_non_chinese_count += 1
+            left_chinese_count = left_labels.count("中文")
+            right_chinese_count = right_labels.count("中文")
+            left_non_chinese_count = len(left_labels) - left_chinese_count
+            right_non_chinese_count = len(right_labels) - right_chinese_count
             
             # 判断是否为翻译版
             is_translated = (right_chinese_count >= left_chinese_count and 
                            left_non_chinese_count > right_non_chinese_count)
             
-            result_info = (f"left_zh={left_chinese_count}, left_non_zh={left_non_chinese_count}, "
+            result_info = (f"{source}: left_zh={left_chinese_count}, left_non_zh={left_non_chinese_count}, "
                           f"right_zh={right_chinese_count}, right_non_zh={right_non_chinese_count}")
             
             return is_translated, result_info
@@ -305,58 +402,87 @@ def detect_translation_status_via_vlm(pdf_path: str,
     except Exception as e:
         return False, f"detection_failed: {e}"
 
+def read_scan_cache(path: Path) -> Dict[str, list]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except Exception:
+        return {}
+
+def write_scan_cache(path: Path, cache: Dict[str, list]):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"  警告：无法写入扫描缓存 {path}: {e}")
+
 def contains_chinese_characters(text: str) -> bool:
     """检查文本是否包含中文字符"""
+    # 纯ASCII字符串（绝大多数文件名）不可能含中文，isascii() 为 O(1) 判断
+    if text.isascii():
+        return False
     return bool(CJK_PATTERN.search(text))
 
 
 def is_normalized_name(stem: str) -> bool:
     """检查文件名是否符合 Author-YYYY-Title 格式"""
+    # 纯ASCII文件名（绝大多数）不可能含中文，一次正则匹配即可完成判定
+    if stem.isascii():
+        return NORMALIZED_NAME_PATTERN.match(stem) is not None
     if contains_chinese_characters(stem):
         return False
-    parts = stem.split("-")
-    if len(parts) < 3:
+    author, sep, rest = stem.partition("-")
+    year, sep, title_rest = rest.partition("-")
+    if not sep:
         return False
-    author, year, title_rest = parts[0], parts[1], "-".join(parts[2:])
-    if not (year.isdigit() and 1900 <= int(year) <= 2099 and len(year) == 4):
+    # isdecimal 的字符串 int() 一定可以解析（含全角数字）；上标数字等 isdigit 为真但无法解析，视为不合格
+    if not (len(year) == 4 and year.isdecimal() and 1900 <= int(year) <= 2099):
         return False
     if any(ch.isdigit() for ch in author):
         return False
     if not any(ch.isalpha() for ch in author):
         return False
-    if not any(ch.isalpha() for ch in title_rest):
-        return False
-    return True
+    return any(ch.isalpha() for ch in title_rest)
 
 
-def get_page_count(pdf_path: Path) -> Optional[int]:
-    """获取PDF页数"""
+def get_page_count(pdf: Union[Path, str, fitz.Document]) -> Optional[int]:
+    """获取PDF页数，可传入路径或已打开的文档"""
     try:
-        with fitz.open(pdf_path) as doc:
+        with open_pdf(pdf) as doc:
             return doc.page_count
     except Exception:
+        if isinstance(pdf, fitz.Document):
+            return None
         try:
             from PyPDF2 import PdfReader
-            with open(pdf_path, "rb") as f:
+            with open(pdf, "rb") as f:
                 reader = PdfReader(f)
                 return len(reader.pages)
         except Exception:
             return None
 
 
-def should_process_pdf(pdf_path: Path, exclusion_keywords: List[str] = None) -> Tuple[bool, str]:
+def should_process_pdf(pdf_path: Path, exclusion_keywords: List[str] = None,
+                       doc: fitz.Document = None, size: Optional[int] = None) -> Tuple[bool, str]:
     """
     检查是否应该处理此PDF文件
+    doc 为调用方已打开的同一文件，读取元数据与页数时复用，不再重复打开；未传入时按路径打开
+    size 为扫描目录时已取得的文件大小，未传入时再 stat
     返回: (是否处理, 排除原因)
     """
     if exclusion_keywords is None:
         exclusion_keywords = []
     
     stem = pdf_path.stem
-    size = pdf_path.stat().st_size
+    if size is None:
+        size = pdf_path.stat().st_size
+    pdf = doc if doc is not None else pdf_path
     
     # 规则1：检查是否已有元数据
-    if has_metadata_attachment(pdf_path):
+    if has_metadata_attachment(pdf):
         return False, "has_metadata"
     
     # 规则2：检查是否为备份文件
@@ -381,7 +507,7 @@ def should_process_pdf(pdf_path: Path, exclusion_keywords: List[str] = None) ->
         return False, "bad_name_pattern"
     
     # 规则7：检查页数
-    pages = get_page_count(pdf_path)
+    pages = get_page_count(pdf)
     if pages is None:
         return False, "page_count_failed"
     if SKIP_MAX_PAGES and pages > MAX_PAGES:
@@ -402,9 +528,10 @@ def should_process_pdf(pdf_path: Path, exclusion_keywords: List[str] = None) ->
 
 def process_single_pdf(pdf_path: Path, model: str = DEFAULT_MODEL, 
                       vlm_model: str = "THUDM/GLM-4.1V-9B-Thinking",
-                      dry_run: bool = False) -> Tuple[bool, str]:
+                      dry_run: bool = False, doc: fitz.Document = None) -> Tuple[bool, str]:
     """
     处理单个PDF文件
+    doc 为调用方已打开的同一文件（由调用方负责关闭）；未传入时自行打开
     
     返回: (是否成功, 结果说明)
     """
@@ -415,22 +542,23 @@ def process_single_pdf(pdf_path: Path, model: str = DEFAULT_MODEL,
         return True, "dry_run"
     
     try:
-        # 获取页面尺寸
-        page_sizes = get_page_sizes(pdf_path)
-        
-        # 使用VLM检测翻译状态
-        is_translated, detection_result = detect_translation_status_via_vlm(
-            str(pdf_path), model=vlm_model
-        )
-        
-        status = "translated" if is_translated else "untranslated"
-        print(f"   检测结果：{status} ({detection_result})")
-        
-        # 创建元数据
-        metadata = create_metadata(status, model, page_sizes)
-        
-        # 嵌入元数据
-        success, result = embed_metadata_attachment(pdf_path, metadata)
+        with open_pdf(doc if doc is not None else pdf_path) as doc:
+            # 获取页面尺寸
+            page_sizes = get_page_sizes(doc)
+            
+            # 使用VLM检测翻译状态
+            is_translated, detection_result = detect_translation_status_via_vlm(
+                doc, model=vlm_model
+            )
+            
+            status = "translated" if is_translated else "untranslated"
+            print(f"   检测结果：{status} ({detection_result})")
+            
+            # 创建元数据
+            metadata = create_metadata(status, model, page_sizes)
+            
+            # 嵌入元数据
+            success, result = embed_metadata_attachment(doc, metadata)
         
         if success:
             print(f"   完成：已嵌入元数据 ({result})")
@@ -443,6 +571,42 @@ def process_single_pdf(pdf_path: Path, model: str = DEFAULT_MODEL,
         print(f"   错误：{e}")
         return False, str(e)
 
+def iter_pdf_entries(root: Path) -> Iterator[os.DirEntry]:
+    """递归遍历目录，逐个产出PDF文件的目录项（DirEntry 缓存了目录读取时的信息，可减少 stat 调用）"""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_pdf_entries(entry.path)
+            elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                yield entry
+
+def check_and_process_pdf(pdf_path: Path, model: str, vlm_model: str, dry_run: bool,
+                          size: Optional[int] = None) -> Tuple[str, str]:
+    """
+    检查并处理单个PDF（可在工作进程中执行）
+    文件只打开一次：筛选、取页面尺寸、VLM检测与嵌入元数据共用同一个文档对象
+    
+    返回: (统计类别 "processed" / "skipped" / "failed", 跳过原因)
+    """
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        print(f"跳过：{pdf_path.name} (open_failed: {e})")
+        return "skipped", "open_failed"
+    
+    with doc:
+        should_process, reason = should_process_pdf(pdf_path, SKIP_KEYWORDS, doc, size)
+        if not should_process:
+            print(f"跳过：{pdf_path.name} ({reason})")
+            return "skipped", reason
+        
+        success, _ = process_single_pdf(pdf_path, model, vlm_model, dry_run, doc)
+    return ("processed" if success else "failed"), ""
+
 def scan_and_process_pdfs(root_dir: Path, model: str = DEFAULT_MODEL,
                           vlm_model: str = "THUDM/GLM-4.1V-9B-Thinking",
                           dry_run: bool = False) -> Dict[str, int]:
@@ -462,35 +626,60 @@ def scan_and_process_pdfs(root_dir: Path, model: str = DEFAULT_MODEL,
     if SKIP_KEYWORDS:
         print(f"排除关键词：{', '.join(SKIP_KEYWORDS)}")
     
-    # 收集所有PDF文件
+    # 收集所有PDF文件：(路径, 修改时间, 文件大小)，取自目录项，后续检查无需再次 stat
     pdf_files = []
-    for root, _, files in os.walk(root_dir):
-        for name in files:
-            if name.lower().endswith(".pdf"):
-                pdf_files.append(Path(root) / name)
+    for entry in iter_pdf_entries(root_dir):
+        st = entry.stat()
+        pdf_files.append((Path(entry.path), st.st_mtime_ns, st.st_size))
     
     stats["total"] = len(pdf_files)
     print(f"发现 {len(pdf_files)} 个PDF文件")
     
-    # 处理每个PDF文件
-    for pdf_path in pdf_files:
-        should_process, reason = should_process_pdf(pdf_path, SKIP_KEYWORDS)
-        
-        if not should_process:
+    # 扫描缓存：上次已判定跳过且未改动的文件直接跳过
+    cache_path = root_dir / SCAN_CACHE_NAME
+    cache = read_scan_cache(cache_path)
+    pending = []
+    for pdf_path, mtime_ns, size in pdf_files:
+        cached = cache.get(str(pdf_path))
+        if cached and cached[:2] == [mtime_ns, size] and cached[2] in CACHEABLE_SKIP_REASONS:
             stats["skipped"] += 1
-            print(f"跳过：{pdf_path.name} ({reason})")
-            continue
-        
-        # 处理PDF
-        success, result = process_single_pdf(pdf_path, model, vlm_model, dry_run)
-        
-        if success:
-            stats["processed"] += 1
+            print(f"跳过：{pdf_path.name} ({cached[2]}, cached)")
         else:
-            stats["failed"] += 1
-        
-        # 添加短暂延迟避免API限制
-        time.sleep(0.5)
+            pending.append((pdf_path, mtime_ns, size))
+    
+    def collect(pdf_path: Path, mtime_ns: int, size: int, category: str, reason: str):
+        # 统计与缓存只由主进程更新
+        stats[category] += 1
+        if category == "skipped" and reason in CACHEABLE_SKIP_REASONS:
+            cache[str(pdf_path)] = [mtime_ns, size, reason]
+        else:
+            cache.pop(str(pdf_path), None)
+    
+    # 处理每个PDF文件：VLM请求由各自的信号量限流，文件之间不再额外等待
+    try:
+        if MAX_WORKERS <= 1:
+            for pdf_path, mtime_ns, size in pending:
+                collect(pdf_path, mtime_ns, size, *check_and_process_pdf(pdf_path, model, vlm_model, dry_run, size))
+        else:
+            print(f"并行处理：{MAX_WORKERS} 个工作进程")
+            with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                futures = {
+                    pool.submit(check_and_process_pdf, pdf_path, model, vlm_model, dry_run, size): (pdf_path, mtime_ns, size)
+                    for pdf_path, mtime_ns, size in pending
+                }
+                for fut in as_completed(futures):
+                    pdf_path, mtime_ns, size = futures[fut]
+                    try:
+                        collect(pdf_path, mtime_ns, size, *fut.result())
+                    except Exception as e:
+                        collect(pdf_path, mtime_ns, size, "failed", "")
+                        print(f"   错误：{pdf_path.name} 处理进程异常（{e}）")
+    finally:
+        # 干运行模式不修改目录中的任何文件（可读取已有缓存，但不写入）
+        if not dry_run:
+            # 只保留本次扫描到的文件
+            scanned = {str(pdf_path) for pdf_path, _, _ in pdf_files}
+            write_scan_cache(cache_path, {k: v for k, v in cache.items() if k in scanned})
     
     return stats
 
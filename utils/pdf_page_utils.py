@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+PDF页面工具模块
+
+提供不加载页面即可读取页面尺寸的功能，供各元数据补全工具共用。
+"""
+
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+
+
+def get_page_rotation(doc: fitz.Document, pno: int) -> int:
+    """读取页面的 /Rotate（可继承自上级 Pages 节点），无需加载页面"""
+    xref = doc.page_xref(pno)
+    while xref:
+        typ, val = doc.xref_get_key(xref, "Rotate")
+        if typ == "int":
+            return int(val) % 360
+        typ, val = doc.xref_get_key(xref, "Parent")
+        xref = int(val.split()[0]) if typ == "xref" else 0
+    return 0
+
+
+def get_page_sizes_pt(doc: fitz.Document) -> List[Dict[str, float]]:
+    """
+    获取已打开PDF每页的尺寸信息（单位：pt）
+    直接读取页面字典的 CropBox 与 Rotate（结果同 page.rect），不加载页面及其注释
+    """
+    sizes = []
+    for pno in range(doc.page_count):
+        rect = doc.page_cropbox(pno)
+        w, h = rect.width, rect.height
+        if get_page_rotation(doc, pno) in (90, 270):
+            w, h = h, w
+        sizes.append({"w": round(w, 2), "h": round(h, 2)})
+    return sizes
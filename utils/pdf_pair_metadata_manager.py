@@ -22,24 +22,34 @@ PDF元数据补全工具
 - 默认模型: Qwen/Qwen2.5-7B-Instruct
 """
 
-import os, sys, json, argparse, statistics, tempfile, shutil, time, uuid
+import os, sys, json, argparse, tempfile, shutil, time, uuid
 from pathlib import Path
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import fitz  # PyMuPDF
 
+sys.path.append(str(Path(__file__).parent))
+from config_utils import load_configuration
+from pdf_page_utils import get_page_sizes_pt
+
 DEFAULT_MODEL = "Qwen/Qwen2.5-7B-Instruct"
+# 并行处理的配对数量（多进程；各配对读写不同文件，互不冲突；不超过CPU核数），为1时按顺序处理
+MAX_WORKERS = max(1, min(load_configuration().get("max_workers", 1), os.cpu_count() or 1))
 
 def iso_utc_now() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-def page_sizes_pt(pdf_path: Path):
-    sizes = []
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            r = page.rect
-            sizes.append({"w": round(r.width, 2), "h": round(r.height, 2)})
-    return sizes
+@contextmanager
+def _open_document(path: Path):
+    """打开PDF；退出时若文档尚未关闭则关闭（_safe_save_in_place 回退时会提前关闭文档）"""
+    doc = fitz.open(path)
+    try:
+        yield doc
+    finally:
+        if not doc.is_closed:
+            doc.close()
 
 def infer_gap_pt(source_sizes, result_sizes):
     """
@@ -52,54 +62,47 @@ def infer_gap_pt(source_sizes, result_sizes):
     返回：
         计算得到的页面间距（中位数）
     """
-    gaps = []
-    n = min(len(source_sizes), len(result_sizes))
-    for i in range(n):
-        lw = source_sizes[i]["w"]
-        rw = lw  # 合并时右侧宽与左侧相同（你的合并逻辑）
-        nw = result_sizes[i]["w"]
-        cand = round(nw - (lw + rw), 2)
-        # 允许少量浮点误差
-        if cand >= -0.5:  # 容忍极小负差
-            gaps.append(max(0.0, round(cand, 2)))
+    # 合并时右侧宽与左侧相同（你的合并逻辑），故 gap = 成品宽 - 2 × 原稿宽
+    cands = [round(r["w"] - 2 * s["w"], 2) for s, r in zip(source_sizes, result_sizes)]
+    # 允许少量浮点误差：容忍极小负差
+    gaps = sorted(max(0.0, c) for c in cands if c >= -0.5)
     if not gaps:
         return 0.0
-    try:
-        return float(round(statistics.median(gaps), 2))
-    except statistics.StatisticsError:
-        return float(round(sum(gaps) / len(gaps), 2))
+    mid = len(gaps) // 2
+    median = gaps[mid] if len(gaps) % 2 else (gaps[mid - 1] + gaps[mid]) / 2
+    return float(round(median, 2))
 
-def ensure_meta_on_original(original_pdf: Path, dry=False):
+def ensure_meta_on_original(doc: fitz.Document, original_pdf: Path, dry=False):
     """
     为原始PDF文件添加最小元数据
     
     参数：
+        doc: 已打开的原始PDF文档（保存后可能被关闭）
         original_pdf: 原始PDF文件路径
         dry: 干运行模式，不实际修改文件
     """
     if dry:
         return
-    with fitz.open(original_pdf) as doc:
-        # 若已有同名嵌入则跳过
-        if _has_embfile(doc, "pdf2zh.meta.json"):
-            return
-        meta = {
-            "pdf2zh": {
-                "status": "untranslated",
-                "run_time_utc": iso_utc_now()
-            }
+    # 若已有同名嵌入则跳过
+    if _has_embfile(doc, "pdf2zh.meta.json"):
+        return
+    meta = {
+        "pdf2zh": {
+            "status": "untranslated",
+            "run_time_utc": iso_utc_now()
         }
-        payload = json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8")
-        # 文档级嵌入（微型 JSON）
-        doc.embfile_add("pdf2zh.meta.json", payload, desc="PDF2ZH metadata")
-        # （尽力而为）声明 AF 关系
-        # 注意：'af' 键在某些PDF版本或PyMuPDF版本中可能不支持
-        try:
-            doc.set_metadata({"af": ["pdf2zh.meta.json"]})
-        except Exception as af_error:
-            # AF关系设置失败不影响主要功能，仅记录警告
-            pass
-        _safe_save_in_place(doc, original_pdf)
+    }
+    payload = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # 文档级嵌入（微型 JSON）
+    doc.embfile_add("pdf2zh.meta.json", payload, desc="PDF2ZH metadata")
+    # （尽力而为）声明 AF 关系
+    # 注意：'af' 键在某些PDF版本或PyMuPDF版本中可能不支持
+    try:
+        doc.set_metadata({"af": ["pdf2zh.meta.json"]})
+    except Exception as af_error:
+        # AF关系设置失败不影响主要功能，仅记录警告
+        pass
+    _safe_save_in_place(doc, original_pdf)
 
 def _has_embfile(doc: fitz.Document, name: str) -> bool:
     """
@@ -113,15 +116,10 @@ def _has_embfile(doc: fitz.Document, name: str) -> bool:
         是否包含该嵌入文件
     """
     try:
-        n = doc.embfile_count()
-        for i in range(n):
-            info = doc.embfile_info(i)
-            nm = info.get("name") or info.get("ufilename") or info.get("filename")
-            if nm == name:
-                return True
+        # 一次取回全部附件名，避免逐个 embfile_info 查询
+        return name in doc.embfile_names()
     except Exception:
-        pass
-    return False
+        return False
 
 def _has_file_annot_for_original(page: fitz.Page, original_name: str) -> bool:
     """
@@ -228,6 +226,19 @@ def _retry_unlink(path: Path, max_retries=5, initial_delay=0.05):
             time.sleep(delay)
     return False
 
+def _iter_pdf_entries(root: Path):
+    """递归遍历目录，逐个产出PDF文件的目录项（os.scandir，不额外 stat）"""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_pdf_entries(entry.path)
+            elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                yield entry
+
 def _cleanup_temp_files(directory: Path):
     """清理遗留的临时文件"""
     try:
@@ -237,21 +248,22 @@ def _cleanup_temp_files(directory: Path):
         pass
 
 def _safe_save_in_place(doc: fitz.Document, path: Path):
-    """鲁棒的保存：完整保存到临时文件，原子替换，失败时退避到旁路文件"""
-    # 优先增量保存
-    try:
-        doc.saveIncr()
-        return
-    except Exception:
-        pass
+    """鲁棒的保存：优先增量保存；否则完整保存到临时文件，原子替换，失败时退避到旁路文件"""
+    # 优先增量保存：只追加改动对象（新增对象压缩存储）
+    if doc.can_save_incrementally():
+        try:
+            doc.save(doc.name, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, deflate=True)
+            return
+        except Exception:
+            pass
     
     # 回退：完整保存到临时文件
     temp_uuid = uuid.uuid4().hex[:8]
     tmp_path = path.parent / f"{path.stem}_tmp_{temp_uuid}.pdf"
     
     try:
-        # 完整保存到临时文件
-        doc.save(str(tmp_path), garbage=4, deflate=True)
+        # 完整保存到临时文件：仅清理未引用对象（garbage=1），不做去重扫描，也不重写/重新压缩已有的内容流、图片和字体
+        doc.save(str(tmp_path), garbage=1, deflate=True, clean=False, deflate_images=False, deflate_fonts=False)
         doc.close()  # 确保所有句柄关闭
         
         # 原子替换（带重试）
@@ -282,24 +294,26 @@ def build_translated_meta(source_sizes, result_sizes, model_name, gap_pt):
 
 def process_pair(final_pdf: Path, original_pdf: Path, model_name: str, margin: int, tagw: int, tagh: int, dry=False):
     print(f"→ 处理：{final_pdf.name}")
-    # 1) 给独立的 *_original.pdf 写最小 JSON
-    ensure_meta_on_original(original_pdf, dry=dry)
-
-    # 2) 采集尺寸+gap
-    source_sizes = page_sizes_pt(original_pdf)
-    result_sizes = page_sizes_pt(final_pdf)
-    gap_pt = infer_gap_pt(source_sizes, result_sizes)
-
-    # 3) 构建 translated 的 JSON
-    meta = build_translated_meta(source_sizes, result_sizes, model_name, gap_pt)
-    payload = json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8")
-
-    if dry:
-        print(f"   （dry-run）gap_pt≈{gap_pt}, src_pages={len(source_sizes)}, out_pages={len(result_sizes)}")
-        return
+    # 每个文件只打开一次：先采集尺寸，再在同一文档上写入元数据
+    with _open_document(original_pdf) as orig_doc:
+        source_sizes = get_page_sizes_pt(orig_doc)
+        # 1) 给独立的 *_original.pdf 写最小 JSON
+        ensure_meta_on_original(orig_doc, original_pdf, dry=dry)
+
+    with _open_document(final_pdf) as doc:
+        # 2) 采集尺寸+gap
+        result_sizes = get_page_sizes_pt(doc)
+        gap_pt = infer_gap_pt(source_sizes, result_sizes)
+
+        # 3) 构建 translated 的 JSON
+        meta = build_translated_meta(source_sizes, result_sizes, model_name, gap_pt)
+        payload = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        if dry:
+            print(f"   （dry-run）gap_pt≈{gap_pt}, src_pages={len(source_sizes)}, out_pages={len(result_sizes)}")
+            return
 
-    # 4) 打开成品，嵌入 JSON，放置点击标签
-    with fitz.open(final_pdf) as doc:
+        # 4) 在已打开的成品上嵌入 JSON，放置点击标签
         # 4.1 JSON 附件（若不存在才写）
         if not _has_embfile(doc, "pdf2zh.meta.json"):
             doc.embfile_add("pdf2zh.meta.json", payload, desc="PDF2ZH metadata")
@@ -308,9 +322,8 @@ def process_pair(final_pdf: Path, original_pdf: Path, model_name: str, margin: i
         if doc.page_count > 0:
             page0 = doc[0]
             if not _has_file_annot_for_original(page0, original_pdf.name):
-                # 读取原稿内容用于标签
-                original_bytes = _read_original_file(original_pdf)
-                _add_clickable_tag(page0, original_bytes, original_pdf.name,
+                # 读取原稿内容用于标签（临时对象，MuPDF 复制后即释放，不会在保存期间常驻内存）
+                _add_clickable_tag(page0, _read_original_file(original_pdf), original_pdf.name,
                                    margin=margin, tagw=tagw, tagh=tagh)
 
         _safe_save_in_place(doc, final_pdf)
@@ -321,13 +334,16 @@ def scan_and_run(root: Path, model_name: str, margin: int, tagw: int, tagh: int,
     # 启动时清理遗留的临时文件
     _cleanup_temp_files(root)
     
+    # 一次遍历收集全部PDF路径，配对查找在集合中完成，无需逐个检查原稿是否存在
+    pdf_paths = [Path(e.path) for e in _iter_pdf_entries(root)]
+    existing = set(pdf_paths)
     pairs = []
-    for p in root.rglob("*.pdf"):
+    for p in pdf_paths:
         if p.name.lower().endswith("_original.pdf"):
             continue
         # 成品对应的原稿
         orig = p.with_name(f"{p.stem}_original.pdf")
-        if orig.exists():
+        if orig in existing:
             pairs.append((p, orig))
 
     if not pairs:
@@ -335,11 +351,24 @@ def scan_and_run(root: Path, model_name: str, margin: int, tagw: int, tagh: int,
         return
 
     print(f"发现 {len(pairs)} 个配对，开始处理……")
-    for final_pdf, original_pdf in pairs:
-        try:
-            process_pair(final_pdf, original_pdf, model_name, margin, tagw, tagh, dry=dry)
-        except Exception as e:
-            print(f"   警告：处理 {final_pdf.name} 失败：{e}")
+    if MAX_WORKERS <= 1:
+        for final_pdf, original_pdf in pairs:
+            try:
+                process_pair(final_pdf, original_pdf, model_name, margin, tagw, tagh, dry=dry)
+            except Exception as e:
+                print(f"   警告：处理 {final_pdf.name} 失败：{e}")
+        return
+
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(process_pair, final_pdf, original_pdf, model_name, margin, tagw, tagh, dry): final_pdf
+            for final_pdf, original_pdf in pairs
+        }
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"   警告：处理 {futures[fut].name} 失败：{e}")
 
 def main():
     """
@@ -17,7 +17,6 @@
 
 import os
 import re
-import tempfile
 from urllib.parse import urlparse
 
 import fitz  # PyMuPDF
@@ -32,9 +31,20 @@ OUTPUT_SUFFIX = "_restored"  # 输出文件名后缀
 
 # ========================================
 
+# 文件名清理：控制字符用 str.translate 一次删除，非法字符连续出现时合并为一个 _
+_CONTROL_CHARS_TABLE = dict.fromkeys(range(0x20))
+_WIN_ILLEGAL_CHARS_RE = re.compile(r'[<>:"/\\|?*]+')
+
+# 复用同一个 HTTP 会话，多个 URL 之间共享连接池，避免重复建立 TLS 连接
+_HTTP_SESSION = requests.Session()
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 下载分块大小（1 MB）
+
 
 def is_valid_url(path: str) -> bool:
     """检查字符串是否为有效的URL地址"""
+    # 本地路径不含 "://"，直接判定，省去 urlparse 的解析开销
+    if "://" not in path[:16]:
+        return False
     try:
         p = urlparse(path)
         return p.scheme in ("http", "https")
@@ -42,32 +52,29 @@ def is_valid_url(path: str) -> bool:
         return False
 
 
-def download_url_to_temporary_file(url: str) -> str:
-    """下载URL内容到临时文件，返回本地文件路径。"""
-    r = requests.get(url, stream=True, timeout=60)
-    r.raise_for_status()
-    total = int(r.headers.get("content-length", 0))
-    suffix = os.path.splitext(urlparse(url).path)[-1] or ".pdf"
-    fd, tmp_path = tempfile.mkstemp(suffix=suffix)
-    os.close(fd)
+def download_url_to_memory(url: str) -> bytearray:
+    """下载URL内容到内存，返回文件内容（直接交给 PyMuPDF 打开，无需落地临时文件）。"""
+    with _HTTP_SESSION.get(url, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        total = int(r.headers.get("content-length", 0))
+        name = os.path.basename(urlparse(url).path) or "download.pdf"
+        buf = bytearray()
 
-    with open(tmp_path, "wb") as f, tqdm(
-            total=total if total > 0 else None,
-            unit="B", unit_scale=True, desc=f"Downloading {os.path.basename(tmp_path)}"
-    ) as bar:
-        for chunk in r.iter_content(chunk_size=1024 * 64):
-            if chunk:
-                f.write(chunk)
-                bar.update(len(chunk))
-    return tmp_path
+        with tqdm(
+                total=total if total > 0 else None,
+                unit="B", unit_scale=True, desc=f"Downloading {name}"
+        ) as bar:
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    buf.extend(chunk)
+                    bar.update(len(chunk))
+    return buf
 
 
 def open_pdf_document(maybe_url_or_path: str):
-    """打开PDF文档，支持本地路径或URL。返回PDF文档对象和临时文件路径。"""
-    tmp_file = None
+    """打开PDF文档，支持本地路径或URL（URL内容下载到内存后直接打开）。返回PDF文档对象。"""
     if is_valid_url(maybe_url_or_path):
-        tmp_file = download_url_to_temporary_file(maybe_url_or_path)
-        doc = fitz.open(tmp_file)
+        doc = fitz.open(stream=download_url_to_memory(maybe_url_or_path), filetype="pdf")
     else:
         doc = fitz.open(maybe_url_or_path)
 
@@ -75,14 +82,14 @@ def open_pdf_document(maybe_url_or_path: str):
         # 尝试使用空密码解密，失败则抛出异常
         if not doc.authenticate(""):
             raise ValueError(f"PDF 受密码保护，无法打开：{maybe_url_or_path}")
-    return doc, tmp_file
+    return doc
 
 
 def sanitize_filename_for_windows(name: str) -> str:
     """清理文件名中的非法字符，确保Windows系统兼容性。"""
     # 去除控制字符并替换 <>:"/\|?* 为 _
-    name = re.sub(r"[\x00-\x1f]", "", name)
-    name = re.sub(r'[<>:"/\\|?*]+', "_", name)
+    name = name.translate(_CONTROL_CHARS_TABLE)
+    name = _WIN_ILLEGAL_CHARS_RE.sub("_", name)
     # 去掉首尾空格与点
     name = name.strip(" .")
     return name or "output"
@@ -104,16 +111,6 @@ def generate_output_filename_from_source(source_path: str, suffix: str) -> str:
     return f"{stem}{suffix}.pdf"
 
 
-def _set_all_page_boxes(page: fitz.Page, rect: fitz.Rect):
-    """设置页面的所有边界框，确保内容正确显示。"""
-    for setter in ("set_mediabox", "set_cropbox", "set_trimbox", "set_bleedbox"):
-        if hasattr(page, setter):
-            try:
-                getattr(page, setter)(rect)
-            except Exception:
-                pass
-
-
 def extract_left_half_from_merged_pdf(merged_pdf: str, out_path: str):
     """
     从横向拼接的PDF中恢复左侧内容，保留所有批注和链接。
@@ -125,11 +122,12 @@ def extract_left_half_from_merged_pdf(merged_pdf: str, out_path: str):
     说明：
         假设拼接时没有中缝间距，直接将页面宽度减半进行裁剪。
     """
-    doc, tmp_file = open_pdf(merged_pdf)
+    doc = open_pdf_document(merged_pdf)
 
     try:
         # 直接修改文档对象，然后保存为新文件
-        for page in doc:
+        for pno in range(doc.page_count):
+            page = doc.load_page(pno)
             current_rect = page.rect
 
             # 新宽度为原宽度的一半，高度保持不变
@@ -138,11 +136,13 @@ def extract_left_half_from_merged_pdf(merged_pdf: str, out_path: str):
 
             # 通过重新设置页面边界框来裁剪右侧内容
             # 左侧的批注等对象由于坐标位于新边界内，因此会被完整保留
-            _set_all_page_boxes(page, new_rect)
+            # set_mediabox 会同时移除 CropBox/TrimBox/BleedBox/ArtBox，其余边界框随之默认等于 MediaBox，
+            # 因此每页只需这一次调用
+            page.set_mediabox(new_rect)
 
         # 保存修改后的文档
         out_dir = os.path.dirname(os.path.abspath(out_path))
-        if out_dir and not os.path.exists(out_dir):
+        if out_dir:
             os.makedirs(out_dir, exist_ok=True)
 
         doc.save(out_path, garbage=4, deflate=True)
@@ -150,12 +150,6 @@ def extract_left_half_from_merged_pdf(merged_pdf: str, out_path: str):
 
     finally:
         doc.close()
-        # 清理临时下载文件
-        if tmp_file and os.path.exists(tmp_file):
-            try:
-                os.remove(tmp_file)
-            except Exception:
-                pass
 
 
 if __name__ == "__main__":